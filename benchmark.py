@@ -0,0 +1,251 @@
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import timeit
+import tracemalloc
+
+import numpy
+
+
+STARTUP_SCRIPT = """
+import time
+start = time.perf_counter()
+
+import pygame
+pygame.init()
+win = pygame.display.set_mode((1400, 900))
+display = time.perf_counter()
+
+import enviroment
+imported = time.perf_counter()
+
+paint = enviroment.DrawingEnvironment(1400, 900)
+paint.update(win)
+first_frame = time.perf_counter()
+
+print(display - start, imported - display, first_frame - imported)
+"""
+
+
+def run_headless(script):
+    environment = dict(os.environ, SDL_VIDEODRIVER="dummy", SDL_AUDIODRIVER="dummy", PYGAME_HIDE_SUPPORT_PROMPT="1")
+    result = subprocess.run(
+        [sys.executable, "-c", script],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        env=environment,
+        capture_output=True,
+        text=True,
+        check=True
+    )
+
+    return result.stdout.split()
+
+
+def startup(repeats):
+    """Times importing the editor and reaching its first frame in fresh interpreters."""
+    timings = [tuple(map(float, run_headless(STARTUP_SCRIPT))) for _ in range(repeats)]
+
+    for name, samples in zip(("pygame", "import", "first frame"), zip(*timings)):
+        print(f"{name + ':':<13}{statistics.median(samples) * 1000:.1f} ms")
+
+
+def car_brain():
+    from neuralnetwork import NeuroEvoloution, Dense
+
+    return NeuroEvoloution(
+        Dense(32, 24, "tanh"),
+        Dense(24, 16, "tanh"),
+        Dense(16, 12, "tanh"),
+        Dense(12, 8, "tanh"),
+        Dense(8, 5, "tanh"),
+    )
+
+
+def inference(repeats):
+    """Compares the per call latency of forward_propagation and the allocation free predict."""
+    brain = car_brain()
+
+    for batch_size in (1, 350):
+        inputs = numpy.random.rand(32, batch_size)
+        assert numpy.array_equal(brain.forward_propagation(inputs), brain.predict(inputs))
+
+        calls = 2000
+        for name, function in (("forward_propagation", brain.forward_propagation), ("predict", brain.predict)):
+            best = min(timeit.repeat(lambda: function(inputs), number=calls, repeat=repeats))
+            print(f"batch {batch_size:<4} {name + ':':<21}{best / calls * 1e6:.2f} us/call")
+
+
+def turnover(repeats):
+    """Times replacing a generation of 350 cars by resetting the pool against building new cars, and what each allocates.
+
+    A pipelined population breeds in the background, so only the swap at the generation boundary is timed for it.
+    """
+    import math
+    import time
+
+    from enviroment import Track
+    from population import Car, Population
+
+    track = Track.from_path("tracks/track0.png")
+    population = Population(350, track, (150, 400), math.pi, model_path=None)
+    population.update_best_genotype(population.cars[0])
+
+    def rebuild():
+        parameters = population.champion.brain.get_parameters()
+        cars = [Car(*population.car_data) for _ in range(population.population_size)]
+
+        for car in cars[1:-1]:
+            car.brain.set_parameters(parameters)
+            car.brain.mutate(population.mutation_rate)
+
+        return cars
+
+    for name, function in (("rebuild cars", rebuild), ("reset pool", population.mutate_cars)):
+        best = min(timeit.repeat(function, number=1, repeat=repeats))
+
+        tracemalloc.start()
+        function()
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        print(f"{name + ':':<14}{best * 1000:.1f} ms, {peak / 1024:.0f} KiB peak allocation")
+
+    pipelined = Population(350, track, (150, 400), math.pi, model_path=None, pipeline=True)
+    pipelined.update_best_genotype(pipelined.cars[0])
+    timings = []
+
+    for _ in range(repeats):
+        pipelined.prepare_offspring()
+        pipelined.preparation.result()
+
+        start = time.perf_counter()
+        pipelined.mutate_cars()
+        timings.append(time.perf_counter() - start)
+
+    print(f"{'swap pools:':<14}{min(timings) * 1000:.2f} ms at the boundary")
+
+
+def sparse(repeats):
+    """Compares dense inference against evolved sparse networks, alone and batched over networks with the same genes."""
+    from neuralnetwork import NeatNetwork, predict_shared
+
+    dense = car_brain()
+    minimal = NeatNetwork(32, 5)
+    grown = NeatNetwork(32, 5)
+
+    while grown.enabled.sum() < len(dense.get_parameters()) // 4:
+        grown.mutate(0.3, 1, 0.05)
+
+    inputs = numpy.random.rand(32, 1)
+    calls = 2000
+
+    for name, brain in (("dense", dense), ("sparse minimal", minimal), ("sparse grown", grown)):
+        connections, levels = (len(brain.get_parameters()), len(brain.network)) if brain is dense else (brain.enabled.sum(), len(brain.plan))
+        best = min(timeit.repeat(lambda: brain.predict(inputs), number=calls, repeat=repeats))
+        print(f"{name + ':':<16}{connections:>5} connections in {levels:>2} levels, {best / calls * 1e6:.2f} us/call")
+
+    networks = [NeatNetwork(32, 5) for _ in range(350)]
+    for network in networks:
+        network.copy_from(grown)
+        network.mutate(0.3, 0, 0)
+
+    batch = numpy.random.rand(32, len(networks))
+
+    def one_by_one():
+        for index, network in enumerate(networks):
+            network.predict(batch[:, index:index + 1])
+
+    for name, function in (("350 one by one", one_by_one), ("350 shared", lambda: predict_shared(networks, batch))):
+        best = min(timeit.repeat(function, number=10, repeat=repeats))
+        print(f"{name + ':':<16}{best / 10 * 1e3:.2f} ms/call")
+
+
+def sensors(repeats):
+    """Trains the same generations with exact and cached sensor readings, reporting speed, hit rate, error and fitness.
+
+    Repeats is the number of generations trained for each setting.
+    """
+    import math
+    import time
+
+    from cache import SensorCache
+    from enviroment import Track
+    from population import Car, Population
+
+    track = Track.from_path("tracks/track0.png")
+
+    for position_step, angle_step in ((None, None), (2, 2), (4, 4), (8, 6)):
+        numpy.random.seed(0)
+        cache = None if position_step is None else SensorCache(position_step, math.radians(angle_step), sample_every=20)
+        population = Population(100, track, (150, 400), math.pi, model_path=None, car_options={"sensor_cache": cache})
+
+        start = time.perf_counter()
+        while population.generation <= repeats:
+            population.train(None, 1)
+        steps_per_second = population.steps / (time.perf_counter() - start)
+
+        name = "exact" if cache is None else f"{position_step} px, {angle_step} deg"
+        line = f"{name + ':':<15}{steps_per_second:7.0f} steps/s, best fitness {population.best_fitness:5.0f}"
+
+        if cache is not None:
+            line += (
+                f", hit rate {cache.hit_rate:.0%}, reading error mean {cache.mean_error:.3f} max {cache.max_error:.3f}"
+                f", ray end within {cache.error_bound(Car.MAX_DEPTH):.1f} px"
+            )
+
+        print(line)
+
+
+def decisions(repeats):
+    """Trains the same generations with the brain deciding every frame and every few frames.
+
+    Repeats is the number of generations trained for each setting. The 95th percentile frame time, leaving out the
+    turnover between generations, shows how staggering spreads the decisions of a population over the interval.
+    """
+    import math
+    import time
+
+    from enviroment import Track
+    from population import Population
+
+    track = Track.from_path("tracks/track0.png")
+
+    for interval, stagger in ((1, False), (2, False), (4, False), (4, True), (8, True)):
+        numpy.random.seed(0)
+        population = Population(
+            100, track, (150, 400), math.pi, model_path=None, car_options={"decision_interval": interval},
+            stagger_decisions=stagger
+        )
+        frames = []
+
+        while population.generation <= repeats:
+            simulated = population.timings["simulate"]
+            population.train(None, 1)
+            frames.append(population.timings["simulate"] - simulated)
+
+        name = f"every {interval}" + (" staggered" if stagger else "")
+        print(
+            f"{name + ':':<20}{population.steps / sum(frames):7.0f} steps/s, 95th percentile frame {numpy.percentile(frames, 95) * 1000:5.1f} ms, "
+            f"final fitness {population.history[-1]:5.0f}, best fitness {population.best_fitness:5.0f}"
+        )
+
+
+BENCHMARKS = {
+    "startup": startup,
+    "inference": inference,
+    "turnover": turnover,
+    "sparse": sparse,
+    "sensors": sensors,
+    "decisions": decisions,
+}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Performance benchmarks for NeuroEvolution.")
+    parser.add_argument("benchmark", choices=BENCHMARKS)
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    BENCHMARKS[args.benchmark](args.repeats)
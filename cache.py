@@ -0,0 +1,236 @@
+import collections as _collections
+import hashlib as _hashlib
+import math as _math
+
+import numpy as _numpy
+
+
+def simulation_key(track, *config) -> bytes:
+    """
+    Fingerprints everything besides the genome that a car's fitness depends on.
+
+    Args:
+        track (Track): The track the cars drive on.
+        *config: Any other settings of the simulation, such as the start pose and frame limits.
+
+    Returns:
+        bytes: A digest of the track's fingerprint and the config.
+    """
+
+    digest = _hashlib.blake2b(track.fingerprint(), digest_size=16)
+    digest.update(repr(config).encode())
+
+    return digest.digest()
+
+
+class FitnessCache:
+    """A bounded LRU of fitnesses keyed by a hash of the genome's parameter bytes and the simulation.
+
+    The simulation is deterministic, so a genome that was already evaluated under the same track and
+    config, like the unmutated champion carried into every generation, does not need simulating again.
+    """
+
+    def __init__(self, context: bytes = b"", max_size: int = 4096) -> None:
+        """
+        Initializes an empty cache.
+
+        Args:
+            context (bytes, optional): The simulation_key the fitnesses are valid for. Defaults to b"".
+            max_size (int, optional): The number of fitnesses kept before the least recently used is evicted. Defaults to 4096.
+        """
+
+        self.context = context
+        self.max_size = max_size
+        self.fitnesses = _collections.OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def key(self, genome: _numpy.ndarray, *extra) -> bytes:
+        # extra holds what a single genome's fitness depends on besides its parameters, such as its decision phase
+        digest = _hashlib.blake2b(self.context + _numpy.ascontiguousarray(genome).tobytes(), digest_size=16)
+
+        if extra:
+            digest.update(repr(extra).encode())
+
+        return digest.digest()
+
+    def get(self, key: bytes):
+        """
+        Looks up a fitness, counting the hit or miss.
+
+        Args:
+            key (bytes): The genome's key.
+
+        Returns:
+            float: The fitness, or None if the genome has not been evaluated.
+        """
+
+        if key in self.fitnesses:
+            self.hits += 1
+            self.fitnesses.move_to_end(key)
+            return self.fitnesses[key]
+
+        self.misses += 1
+        return None
+
+    def put(self, key: bytes, fitness: float) -> None:
+        self.fitnesses[key] = fitness
+        self.fitnesses.move_to_end(key)
+
+        if len(self.fitnesses) > self.max_size:
+            self.fitnesses.popitem(last=False)
+            self.evictions += 1
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def wrap(self, evaluate):
+        """
+        Wraps a function evaluating a (genomes, parameters) array so only uncached genomes reach it.
+
+        Args:
+            evaluate (function): The evaluation function.
+
+        Returns:
+            function: The cached evaluation function.
+        """
+
+        def cached_evaluate(genomes):
+            keys = [self.key(genome) for genome in genomes]
+            fitnesses = _numpy.array([self.get(key) for key in keys], dtype=float)
+            missing = _numpy.flatnonzero(_numpy.isnan(fitnesses))
+
+            if len(missing):
+                fitnesses[missing] = evaluate(genomes[missing])
+
+                for index in missing:
+                    self.put(keys[index], fitnesses[index])
+
+            return fitnesses
+
+        return cached_evaluate
+
+
+class SensorCache:
+    """A bounded LRU of sensor readings keyed by a car's pose rounded to a grid of positions and headings.
+
+    A miss senses from the centre of the pose's cell rather than the exact pose, so a reading only depends on
+    the cell and not on which car got there first, and the simulation stays deterministic. The price is that
+    a car senses from up to half a cell away from where it is.
+    """
+
+    def __init__(self, position_step: float = 2.0, angle_step: float = _math.radians(2), max_size: int = 65536,
+                 sample_every: int = 0) -> None:
+        """
+        Initializes an empty cache.
+
+        Args:
+            position_step (float, optional): The width of a position cell in pixels. Defaults to 2.0.
+            angle_step (float, optional): The width of a heading cell in radians. Defaults to 2 degrees.
+            max_size (int, optional): The number of readings kept before the least recently used is evicted. Defaults to 65536.
+            sample_every (int, optional): Also sense the exact pose on every nth lookup to measure the error, 0 to never. Defaults to 0.
+        """
+
+        self.position_step = position_step
+        self.angle_cells = max(round(2 * _math.pi / angle_step), 1)
+        self.angle_step = 2 * _math.pi / self.angle_cells
+        self.max_size = max_size
+        self.sample_every = sample_every
+        self.reset()
+
+    def reset(self, track=None) -> None:
+        """
+        Forgets every reading and the statistics, readings are only valid for the track they were taken on.
+
+        Args:
+            track (Track, optional): The track the next readings are for. Defaults to None.
+        """
+
+        self.track = track
+        self.readings = _collections.OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self.samples = 0
+        self.total_error = 0.0
+        self.max_error = 0.0
+
+    def key(self, center_x: float, center_y: float, angle: float) -> tuple:
+        return (
+            round(center_x / self.position_step), round(center_y / self.position_step),
+            round(angle / self.angle_step) % self.angle_cells
+        )
+
+    def pose(self, key: tuple) -> tuple:
+        return key[0] * self.position_step, key[1] * self.position_step, key[2] * self.angle_step
+
+    def get(self, car, center_x: float, center_y: float, angle: float) -> _numpy.ndarray:
+        """
+        Looks up a car's reading, sensing from the centre of its cell on a miss.
+
+        Args:
+            car (Car): The car, whose track and sensors are used on a miss.
+            center_x (float): The x position the car senses from.
+            center_y (float): The y position the car senses from.
+            angle (float): The car's heading.
+
+        Returns:
+            numpy.ndarray: The (directions, 1) reading, shared with other cars so it must not be written to.
+        """
+
+        if car.track is not self.track:
+            self.reset(car.track)
+
+        key = (*self.key(center_x, center_y, angle), car.DIRECTIONS)
+        reading = self.readings.get(key)
+
+        if reading is None:
+            self.misses += 1
+            reading = self.readings[key] = car.sense(*self.pose(key))
+
+            if len(self.readings) > self.max_size:
+                self.readings.popitem(last=False)
+                self.evictions += 1
+
+        else:
+            self.hits += 1
+            self.readings.move_to_end(key)
+
+        if self.sample_every and (self.hits + self.misses) % self.sample_every == 0:
+            error = float(_numpy.abs(reading - car.sense(center_x, center_y, angle)).max())
+            self.samples += 1
+            self.total_error += error
+            self.max_error = max(self.max_error, error)
+
+        return reading
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    @property
+    def mean_error(self) -> float:
+        return self.total_error / self.samples if self.samples else 0.0
+
+    def error_bound(self, max_depth: float) -> float:
+        """
+        Bounds how far a ray's far end can be from where it would be from the car's exact pose.
+
+        The ray starts at most half a cell diagonal away and turns at most half a heading cell, a reading can
+        still jump when that moves the ray past an edge, which the sampled errors show.
+
+        Args:
+            max_depth (float): The length of the rays in pixels.
+
+        Returns:
+            float: The distance in pixels.
+        """
+
+        return self.position_step / _math.sqrt(2) + max_depth * self.angle_step / 2
\ No newline at end of file
@@ -0,0 +1,448 @@
+import argparse as _argparse
+import math as _math
+import queue as _queue
+import socket as _socket
+import struct as _struct
+import subprocess as _subprocess
+import sys as _sys
+import threading as _threading
+
+import numpy as _numpy
+
+# every message is a 1 byte type and a 4 byte payload length followed by the payload, all network order
+HEADER = _struct.Struct("!BI")
+TRACK_HEADER = _struct.Struct("!IIddd")
+BATCH_HEADER = _struct.Struct("!III")
+LINEAGE_HEADER = _struct.Struct("!IIII")
+RESULT_HEADER = _struct.Struct("!II")
+
+REGISTER, TRACK, BATCH, RESULT, SHUTDOWN, LINEAGE_BATCH = range(6)
+
+# genomes and fitnesses travel as little endian float64 arrays
+FLOAT = _numpy.dtype("<f8")
+
+# workers a batch may fail on before the coordinator gives up on it
+MAX_ATTEMPTS = 3
+
+
+def send_message(connection, message_type, payload=b""):
+    connection.sendall(HEADER.pack(message_type, len(payload)) + payload)
+
+
+def _receive_exactly(connection, size):
+    data = bytearray()
+
+    while len(data) < size:
+        chunk = connection.recv(size - len(data))
+        if not chunk:
+            raise ConnectionError("connection closed")
+
+        data += chunk
+
+    return bytes(data)
+
+
+def receive_message(connection):
+    message_type, length = HEADER.unpack(_receive_exactly(connection, HEADER.size))
+    return message_type, _receive_exactly(connection, length)
+
+
+def encode_track(occupancy, start_position, start_angle):
+    """
+    Compiles a track into a TRACK payload, a bit packed occupancy grid and the start pose.
+
+    Args:
+        occupancy (numpy.ndarray): A (width, height) boolean array, True where the car collides.
+        start_position (tuple): The cars' start position.
+        start_angle (float): The cars' start angle in radians.
+
+    Returns:
+        bytes: The payload.
+    """
+
+    width, height = occupancy.shape
+    return TRACK_HEADER.pack(width, height, *start_position, start_angle) + _numpy.packbits(occupancy).tobytes()
+
+
+def decode_track(payload):
+    width, height, x, y, angle = TRACK_HEADER.unpack_from(payload)
+    bits = _numpy.frombuffer(payload, dtype=_numpy.uint8, offset=TRACK_HEADER.size)
+    occupancy = _numpy.unpackbits(bits, count=width * height).reshape(width, height).astype(bool)
+
+    return occupancy, (x, y), angle
+
+
+def encode_lineage_batch(batch_id, bases, records):
+    """
+    Compiles a LINEAGE_BATCH payload, genomes sent as their parents' parameters and a mutation record each.
+
+    Args:
+        batch_id (int): The batch's id.
+        bases (numpy.ndarray): A (parents, parameters) array.
+        records (numpy.ndarray): A lineage.RECORD array with one entry per genome.
+
+    Returns:
+        bytes: The payload.
+    """
+
+    header = LINEAGE_HEADER.pack(batch_id, len(records), *bases.shape)
+    return header + bases.astype(FLOAT).tobytes() + records.tobytes()
+
+
+def decode_lineage_batch(payload):
+    from lineage import RECORD
+
+    batch_id, count, parents, size = LINEAGE_HEADER.unpack_from(payload)
+    bases = _numpy.frombuffer(payload, dtype=FLOAT, count=parents * size, offset=LINEAGE_HEADER.size).reshape(parents, size)
+    records = _numpy.frombuffer(payload, dtype=RECORD, count=count, offset=LINEAGE_HEADER.size + bases.nbytes)
+
+    return batch_id, bases, records
+
+
+class Coordinator:
+    """Hands batches of genomes to TCP workers and collects their fitnesses.
+
+    Workers may join at any time. A batch whose worker fails or does not answer within the timeout is
+    put back in the queue for another worker, and the failed worker is dropped. A batch that fails on
+    MAX_ATTEMPTS workers, or a wait of a whole timeout with no worker connected, raises instead.
+    """
+
+    def __init__(self, occupancy, start_position, start_angle, host="127.0.0.1", port=0, timeout=60.0):
+        """
+        Starts listening for workers.
+
+        Args:
+            occupancy (numpy.ndarray): The track's (width, height) collision grid.
+            start_position (tuple): The cars' start position.
+            start_angle (float): The cars' start angle in radians.
+            host (str, optional): The address to listen on. Defaults to "127.0.0.1".
+            port (int, optional): The port to listen on, 0 picks a free one. Defaults to 0.
+            timeout (float, optional): Seconds a worker gets to return a batch. Defaults to 60.
+        """
+
+        self.track = encode_track(occupancy, start_position, start_angle)
+        self.timeout = timeout
+
+        self.batches = _queue.Queue()
+        self.results = _queue.Queue()
+        self.workers = 0
+        self.lock = _threading.Lock()
+
+        self.server = _socket.create_server((host, port))
+        self.address = self.server.getsockname()
+        self.running = True
+
+        _threading.Thread(target=self._accept, daemon=True).start()
+
+    def _accept(self):
+        while self.running:
+            try:
+                connection, _ = self.server.accept()
+
+            except OSError:
+                break
+
+            _threading.Thread(target=self._serve, args=(connection,), daemon=True).start()
+
+    def _serve(self, connection):
+        batch = None
+
+        try:
+            connection.settimeout(self.timeout)
+            message_type, _ = receive_message(connection)
+
+            if message_type != REGISTER:
+                return
+
+            send_message(connection, TRACK, self.track)
+
+            with self.lock:
+                self.workers += 1
+
+            while self.running:
+                batch = self.batches.get()
+                if batch is None:
+                    break
+
+                batch_id, batch_type, payload, batch_count, _ = batch
+                send_message(connection, batch_type, payload)
+
+                message_type, payload = receive_message(connection)
+                result_id, count = RESULT_HEADER.unpack_from(payload)
+
+                if message_type != RESULT or result_id != batch_id or count != batch_count:
+                    raise ConnectionError("unexpected reply")
+
+                self.results.put((batch_id, _numpy.frombuffer(payload, dtype=FLOAT, offset=RESULT_HEADER.size)))
+                batch = None
+
+            send_message(connection, SHUTDOWN)
+
+        except (OSError, ConnectionError, _struct.error):
+            pass
+
+        finally:
+            if batch is not None and batch[4] + 1 < MAX_ATTEMPTS:
+                self.batches.put((*batch[:4], batch[4] + 1))
+
+            elif batch is not None:
+                self.results.put((batch[0], None))
+
+            with self.lock:
+                self.workers -= 1
+
+            connection.close()
+
+    def evaluate(self, genomes, batch_size=32):
+        """
+        Evaluates genomes on the connected workers.
+
+        Args:
+            genomes (numpy.ndarray): A (genomes, parameters) array.
+            batch_size (int, optional): The number of genomes sent to a worker at once. Defaults to 32.
+
+        Returns:
+            numpy.ndarray: The fitness of every genome.
+        """
+
+        batches = range(0, len(genomes), batch_size)
+
+        for start in batches:
+            self.submit(start, genomes[start:start + batch_size])
+
+        fitnesses = _numpy.empty(len(genomes))
+
+        for _ in batches:
+            start, batch_fitnesses = self.collect()
+            fitnesses[start:start + len(batch_fitnesses)] = batch_fitnesses
+
+        return fitnesses
+
+    def submit(self, batch_id, genomes):
+        """
+        Queues a batch for the next free worker without waiting for it.
+
+        Args:
+            batch_id (int): The id collect returns the batch's fitnesses under.
+            genomes (numpy.ndarray): A (genomes, parameters) array.
+        """
+
+        payload = BATCH_HEADER.pack(batch_id, *genomes.shape) + genomes.astype(FLOAT).tobytes()
+        self.batches.put((batch_id, BATCH, payload, len(genomes), 0))
+
+    def evaluate_lineage(self, lineage, genome_ids, batch_size=32):
+        """
+        Evaluates genomes on the connected workers, sending each as its parent and a mutation record.
+
+        A batch of children of the same champion then costs the champion's parameters once and 12 bytes
+        per child, and workers rebuild the children from the shared noise table.
+
+        Args:
+            lineage (Lineage): The lineage the genomes belong to.
+            genome_ids (list): The genomes' ids.
+            batch_size (int, optional): The number of genomes sent to a worker at once. Defaults to 32.
+
+        Returns:
+            numpy.ndarray: The fitness of every genome.
+        """
+
+        batches = range(0, len(genome_ids), batch_size)
+
+        for start in batches:
+            bases, records = lineage.split(genome_ids[start:start + batch_size])
+            self.batches.put((start, LINEAGE_BATCH, encode_lineage_batch(start, bases, records), len(records), 0))
+
+        fitnesses = _numpy.empty(len(genome_ids))
+
+        for _ in batches:
+            start, batch_fitnesses = self.collect()
+            fitnesses[start:start + len(batch_fitnesses)] = batch_fitnesses
+
+        return fitnesses
+
+    def collect(self):
+        """
+        Waits for any submitted batch to finish.
+
+        Returns:
+            tuple: The batch's id and the fitness of each of its genomes.
+        """
+
+        while True:
+            try:
+                batch_id, fitnesses = self.results.get(timeout=self.timeout)
+                break
+
+            except _queue.Empty:
+                # connected workers give up on a batch within the timeout themselves, so only an empty pool waits forever
+                if self.workers == 0:
+                    raise RuntimeError(f"no worker connected for {self.timeout:g} seconds") from None
+
+        if fitnesses is None:
+            raise RuntimeError(f"batch {batch_id} failed on {MAX_ATTEMPTS} workers")
+
+        return batch_id, fitnesses
+
+    def close(self):
+        self.running = False
+
+        for _ in range(self.workers):
+            self.batches.put(None)
+
+        self.server.close()
+
+
+def run_worker(host, port):
+    """
+    Connects to a coordinator and evaluates the batches it sends until it shuts down.
+
+    Args:
+        host (str): The coordinator's address.
+        port (int): The coordinator's port.
+    """
+
+    import pygame
+
+    from enviroment import Track
+    from population import evaluate
+
+    pygame.init()
+
+    with _socket.create_connection((host, port)) as connection:
+        send_message(connection, REGISTER)
+
+        message_type, payload = receive_message(connection)
+        occupancy, start_position, start_angle = decode_track(payload)
+        track = Track.from_occupancy(occupancy)
+        noise_table = None
+
+        while True:
+            message_type, payload = receive_message(connection)
+
+            if message_type == BATCH:
+                batch_id, count, size = BATCH_HEADER.unpack_from(payload)
+                genomes = _numpy.frombuffer(payload, dtype=FLOAT, offset=BATCH_HEADER.size).reshape(count, size)
+
+            elif message_type == LINEAGE_BATCH:
+                from lineage import NoiseTable
+
+                noise_table = noise_table or NoiseTable()
+                batch_id, bases, records = decode_lineage_batch(payload)
+                count, genomes = len(records), noise_table.expand(bases, records)
+
+            else:
+                break
+
+            fitnesses = evaluate(track, start_position, start_angle, genomes).astype(FLOAT)
+            send_message(connection, RESULT, RESULT_HEADER.pack(batch_id, count) + fitnesses.tobytes())
+
+
+def spawn_workers(host, port, count):
+    """Starts local worker processes, stand-ins for workers on other machines."""
+
+    return [
+        _subprocess.Popen([_sys.executable, __file__, "worker", "--host", host, "--port", str(port)])
+        for _ in range(count)
+    ]
+
+
+if __name__ == "__main__":
+    parser = _argparse.ArgumentParser(description="Distributed genome evaluation over TCP.")
+    subparsers = parser.add_subparsers(dest="mode", required=True)
+
+    worker = subparsers.add_parser("worker", help="evaluate genomes for a coordinator")
+    worker.add_argument("--host", default="127.0.0.1")
+    worker.add_argument("--port", type=int, required=True)
+
+    coordinator = subparsers.add_parser("coordinator", help="train a population on workers")
+    coordinator.add_argument("track")
+    coordinator.add_argument("--start", type=float, nargs=3, metavar=("X", "Y", "ANGLE"),
+                             help="start position and angle in degrees, read from the track's generator metadata when omitted")
+    coordinator.add_argument("--population", type=int, default=350)
+    coordinator.add_argument("--generations", type=int, default=10)
+    coordinator.add_argument("--host", default="127.0.0.1")
+    coordinator.add_argument("--port", type=int, default=0)
+    coordinator.add_argument("--local-workers", type=int, default=0, help="number of worker processes to start on this machine")
+    coordinator.add_argument("--batch-size", type=int, default=32)
+    coordinator.add_argument("--timeout", type=float, default=60.0)
+    coordinator.add_argument("--steady-state", action="store_true",
+                             help="breed a new batch as soon as any batch returns instead of waiting for whole generations")
+    coordinator.add_argument("--in-flight", type=int, default=4, help="batches out at once in steady state mode")
+    coordinator.add_argument("--metrics-port", type=int, metavar="PORT", help="serve training metrics on this port")
+    coordinator.add_argument("--lineage", metavar="PATH",
+                             help="send children as their parent's id and a noise seed and checkpoint the lineage to PATH.npz")
+    args = parser.parse_args()
+
+    if args.mode == "worker":
+        run_worker(args.host, args.port)
+
+    else:
+        import pygame
+
+        from cache import FitnessCache, simulation_key
+        from enviroment import Track
+        from population import MAX_FRAMES, PROGRESS_WINDOW, STATIONARY_FRAMES, Population
+
+        pygame.init()
+
+        track = Track.from_path(args.track)
+        if args.start is None:
+            from generator import load_pose
+
+            start_position, start_angle = load_pose(args.track)
+
+        else:
+            start_position, start_angle = tuple(args.start[:2]), args.start[2] * _math.pi / 180
+
+        coordinator = Coordinator(track.occupancy(), start_position, start_angle, args.host, args.port, args.timeout)
+        print(f"listening on {coordinator.address[0]}:{coordinator.address[1]}")
+        workers = spawn_workers(*coordinator.address, args.local_workers)
+
+        fitness_cache = FitnessCache(simulation_key(track, start_position, start_angle, STATIONARY_FRAMES, PROGRESS_WINDOW, MAX_FRAMES))
+        lineage = None
+
+        if args.lineage:
+            from lineage import Lineage
+
+            lineage = Lineage()
+
+        population = Population(args.population, track, start_position, start_angle, fitness_cache, args.steady_state, lineage=lineage)
+
+        if args.metrics_port is not None:
+            from metrics import MetricsServer
+
+            MetricsServer(population, args.host, args.metrics_port)
+
+        if args.steady_state:
+            population.evaluate_steady_state(
+                coordinator.submit, coordinator.collect, args.population * args.generations, args.batch_size, args.in_flight
+            )
+
+            for generation, fitness in enumerate(population.history, 1):
+                print(f"generation {generation}: {fitness:.2f}")
+
+            print(f"best {population.best_fitness:.2f}, cache hit rate {fitness_cache.hit_rate:.1%}")
+
+            if lineage is not None:
+                lineage.save(args.lineage)
+
+        else:
+            for _ in range(args.generations):
+                if lineage is None:
+                    population.evaluate_generation(lambda genomes: coordinator.evaluate(genomes, args.batch_size))
+
+                else:
+                    population.evaluate_generation(
+                        lambda genome_ids: coordinator.evaluate_lineage(lineage, genome_ids, args.batch_size), encoded=True
+                    )
+                    lineage.save(args.lineage)
+
+                print(
+                    f"generation {population.generation - 1}: {population.history[-1]:.2f} (best {population.best_fitness:.2f}, "
+                    f"cache hit rate {fitness_cache.hit_rate:.1%})"
+                )
+
+        coordinator.close()
+
+        for worker in workers:
+            worker.wait()
\ No newline at end of file
@@ -1,31 +1,113 @@
+import hashlib
 import math
 import os
 
-import cv2
 import numpy
 import pygame
 
 from gui import TextInputArea, ToggleButton, ColourPicker, Slider, Button
-from spritesheet import Spritesheet
+from spritesheet import Spritesheet, load_image
+
+
+PROGRESS_CELL = 4
+
+
+def progress_field(occupancy, start, angle, cell_size=PROGRESS_CELL):
+    # geodesic distance in cells from the start over drivable cells, found by growing a frontier one ring at a time
+    free = ~occupancy[cell_size // 2::cell_size, cell_size // 2::cell_size]
+    width, height = free.shape
+
+    # a wall just behind the start so the field only grows forwards and a lap ends where it started
+    forward_x, forward_y = -math.sin(angle), -math.cos(angle)
+    behind_x, behind_y = start[0] - forward_x * cell_size * 2, start[1] - forward_y * cell_size * 2
+    free[int(start[0]) // cell_size, int(start[1]) // cell_size] = True
+
+    for side in (1, -1):
+        x, y = behind_x, behind_y
+
+        while 0 <= x < width * cell_size - cell_size and 0 <= y < height * cell_size - cell_size and not occupancy[int(x), int(y)]:
+            free[int(x) // cell_size:int(x) // cell_size + 2, int(y) // cell_size:int(y) // cell_size + 2] = False
+            x += forward_y * side * cell_size / 2
+            y -= forward_x * side * cell_size / 2
+
+    distance = numpy.full(free.shape, -1, numpy.int32)
+    frontier = numpy.zeros(free.shape, bool)
+    frontier[int(start[0]) // cell_size, int(start[1]) // cell_size] = True
+    steps = 0
+
+    while frontier.any():
+        distance[frontier] = steps
+        steps += 1
+
+        grown = frontier.copy()
+        grown[1:] |= frontier[:-1]
+        grown[:-1] |= frontier[1:]
+        grown[:, 1:] |= grown[:, :-1].copy()
+        grown[:, :-1] |= grown[:, 1:].copy()
+
+        frontier = grown & free & (distance < 0)
+
+    return distance
 
 
 class Track:
-    def __init__(self, surface, colourkey=(255, 255, 255)):
+    def __init__(self, surface, colourkey=(255, 255, 255), size=(1400, 900)):
         track = surface
-        self.WIDTH, self.HEIGHT = 1400, 900
+        self.WIDTH, self.HEIGHT = max(size[0], track.get_width()), max(size[1], track.get_height())
+        self.TOP = self.HEIGHT - track.get_height()
         self.image = pygame.Surface((self.WIDTH, self.HEIGHT))
         self.image.fill((75, 75, 75))
         self.image.blit(track, (0, self.image.get_height() - track.get_height()))
         self.image.set_colorkey(colourkey)
-        self.image = self.image.convert_alpha()
+
+        if pygame.display.get_surface():
+            self.image = self.image.convert_alpha()
 
         self.mask = pygame.mask.from_surface(self.image)
+        self.get_at = self.mask.get_at
+
+        self.progress = None
+        self.progress_start = None
 
     @classmethod
     def from_path(cls, path):
         track = pygame.image.load(path)
         return cls(track)
 
+    @classmethod
+    def from_occupancy(cls, occupancy):
+        track = numpy.where(occupancy[..., numpy.newaxis], (75, 75, 75), (255, 255, 255)).astype(numpy.uint8)
+        return cls(pygame.surfarray.make_surface(track))
+
+
+    def collides(self, mask, x, y):
+        return mask.overlap(self.mask, (-x, -y))
+
+
+    def occupancy(self):
+        return pygame.surfarray.array_red(self.mask.to_surface()) > 0
+
+
+    def fingerprint(self):
+        return hashlib.blake2b(numpy.packbits(self.occupancy()).tobytes(), digest_size=16).digest()
+
+
+    def measure_progress(self, start, angle):
+        if self.progress_start != (*start, angle):
+            self.progress = progress_field(self.occupancy(), start, angle)
+            self.progress_start = (*start, angle)
+
+        return self.progress
+
+
+    def progress_at(self, position):
+        x, y = int(position[0]) // PROGRESS_CELL, int(position[1]) // PROGRESS_CELL
+
+        if not (0 <= x < self.progress.shape[0] and 0 <= y < self.progress.shape[1]):
+            return -1
+
+        return int(self.progress[x, y]) * PROGRESS_CELL
+
 
     def draw(self, surface, x, y):
 
@@ -97,14 +179,14 @@ class DrawingEnvironment:
         )
 
         load = Button(
-            pygame.image.load("assets/load_button_up.png").convert_alpha(),
-            pygame.image.load("assets/load_button_down.png").convert_alpha(),
+            load_image("assets/load_button_up.png"),
+            load_image("assets/load_button_down.png"),
             1095, 1
         )
 
         car = ToggleButton(
-            pygame.image.load("assets/car_button_up.png").convert_alpha(),
-            pygame.image.load("assets/car_button_down.png").convert_alpha(),
+            load_image("assets/car_button_up.png"),
+            load_image("assets/car_button_down.png"),
             1180, 1
         )
 
@@ -160,20 +242,30 @@ class DrawingEnvironment:
         self.canvas_x, self.canvas_y = 0, self.BORDER_SIZE
         self.canvas.fill((255, 255, 255))
 
+        # shapes are previewed on a transparent overlay and only committed to the canvas on release
+        self.overlay = pygame.Surface(self.canvas.get_size(), pygame.SRCALPHA)
+        self.preview_rect = pygame.Rect(0, 0, 0, 0)
+
+        self.ui_layer = pygame.Surface((window_width, self.BORDER_SIZE))
+        self.dirty_rects = []
+        self.redraw = True
+        self.ui_changed = True
+        self.cursor_rect = pygame.Rect(0, 0, 0, 0)
+
         self.colour = 0, 0, 0
 
         self.previous_position = None
         self.start_position = None
 
-        self.shape = pygame.Surface((0, 0))
-        self.shape.fill((255, 255, 255))
-        self.pos = 0, 0
         self.pressed = False
+        self.mouse_was_pressed = False
         self.saved = False
 
         self.car_position = None
         self.car_angle = 270
-        self.car_image = pygame.transform.rotate(pygame.image.load("assets/car.png").convert_alpha(), self.car_angle)
+        self.car_image = pygame.transform.rotate(load_image("assets/car.png"), self.car_angle)
+
+        self.fill_mask = None
 
         self.tracks = len(os.listdir("tracks"))
         self.editing_track = None
@@ -182,8 +274,6 @@ class DrawingEnvironment:
 
     def draw_ui(self, surface):
         pygame.draw.rect(surface, ((75, 75, 75)), (0, 0, self.canvas.get_width(), self.BORDER_SIZE))
-        if self.car_position:
-            surface.blit(self.car_image, (self.car_position))
 
         self.picker.draw(surface)
         self.colour_slider.draw(surface)
@@ -198,17 +288,32 @@ class DrawingEnvironment:
             text_box.draw(surface, (75, 75, 75))
 
 
-    def create_temp_colour(self):
-        while True:
-            colour = tuple(numpy.random.randint(0, 255) for i in range(3))
+    def mark_dirty(self, rect, on_canvas=True):
+        if on_canvas:
+            rect = rect.move(self.canvas_x, self.canvas_y)
+
+        self.dirty_rects.append(pygame.Rect(rect))
+
+
+    def draw_preview(self, draw, *shape):
+        self.overlay.fill((0, 0, 0, 0), self.preview_rect)
+        self.mark_dirty(self.preview_rect)
+
+        self.preview_rect = draw(self.overlay, self.colour, *shape)
+        self.mark_dirty(self.preview_rect)
+
 
-            if colour != self.colour:
-                return colour
+    def commit_preview(self):
+        self.canvas.blit(self.overlay, self.preview_rect, self.preview_rect)
+        self.overlay.fill((0, 0, 0, 0), self.preview_rect)
+        self.mark_dirty(self.preview_rect)
 
+        self.preview_rect = pygame.Rect(0, 0, 0, 0)
 
-    def line(self, _):
+
+    def line(self):
         if self.previous_position:
-            pygame.draw.line(self.canvas, self.colour, self.pen_position, self.previous_position, self.pen_size)
+            self.mark_dirty(pygame.draw.line(self.canvas, self.colour, self.pen_position, self.previous_position, self.pen_size))
 
             distance = math.sqrt(
                 (self.pen_position[0] - self.previous_position[0]) ** 2
@@ -216,15 +321,13 @@ class DrawingEnvironment:
             )
 
             if distance < 60:
-                pygame.draw.circle(self.canvas, self.colour, self.pen_position, self.pen_size / 2.1)
+                self.mark_dirty(pygame.draw.circle(self.canvas, self.colour, self.pen_position, self.pen_size / 2.1))
 
         else:
-            pygame.draw.circle(self.canvas, self.colour, self.pen_position, self.pen_size // 2)
-
-        return self.shape, self.pos
+            self.mark_dirty(pygame.draw.circle(self.canvas, self.colour, self.pen_position, self.pen_size // 2))
 
 
-    def rectangle(self, surface):
+    def rectangle(self):
         if not self.start_position:
             self.start_position = self.pen_position
 
@@ -240,21 +343,12 @@ class DrawingEnvironment:
             y += height
             height = abs(height)
 
-        rectangle = pygame.Surface((width, height))
-        temp_colour = self.create_temp_colour()
-        rectangle.fill(temp_colour)
-        rectangle.set_colorkey(temp_colour)
-
-        pygame.draw.rect(rectangle, self.colour, (0, 0, width, height), self.pen_size)
-
-        surface.blit(rectangle, (x, y + self.BORDER_SIZE))
-
-        return rectangle, (x, y)
+        self.draw_preview(pygame.draw.rect, (x, y, width, height), self.pen_size)
 
 
-    def rubber(self, _):
+    def rubber(self):
         if self.previous_position:
-            pygame.draw.line(self.canvas, (255, 255, 255), self.pen_position, self.previous_position, self.pen_size)
+            self.mark_dirty(pygame.draw.line(self.canvas, (255, 255, 255), self.pen_position, self.previous_position, self.pen_size))
 
             distance = math.sqrt(
                 (self.pen_position[0] - self.previous_position[0]) ** 2
@@ -262,15 +356,13 @@ class DrawingEnvironment:
             )
 
             if distance < 60:
-                pygame.draw.circle(self.canvas, (255, 255, 255), self.pen_position, self.pen_size / 2.1)
+                self.mark_dirty(pygame.draw.circle(self.canvas, (255, 255, 255), self.pen_position, self.pen_size / 2.1))
 
         else:
-            pygame.draw.circle(self.canvas, (255, 255, 255), self.pen_position, self.pen_size // 2)  
+            self.mark_dirty(pygame.draw.circle(self.canvas, (255, 255, 255), self.pen_position, self.pen_size // 2))
 
-        return self.shape, self.pos
 
-
-    def circle(self, surface):
+    def circle(self):
         if not self.start_position:
             self.start_position = self.pen_position
 
@@ -286,20 +378,10 @@ class DrawingEnvironment:
         if dy > 0:
             y -= diameter
 
-        circle = pygame.Surface((diameter, diameter))
-
-        temp_colour = self.create_temp_colour()
-        circle.fill(temp_colour)
-        circle.set_colorkey(temp_colour)
-
-        pygame.draw.circle(circle, self.colour, (radius, radius), radius, self.pen_size)
-
-        surface.blit(circle, (x, y + self.BORDER_SIZE))
+        self.draw_preview(pygame.draw.circle, (x + radius, y + radius), radius, self.pen_size)
 
-        return circle, (x, y)
 
-
-    def ellipse(self, surface):
+    def ellipse(self):
         if not self.start_position:
             self.start_position = self.pen_position
 
@@ -315,44 +397,46 @@ class DrawingEnvironment:
             y += height
             height = abs(height)
 
-        temp_colour = self.create_temp_colour()
-        ellipse = pygame.Surface((width, height))
-        ellipse.fill(temp_colour)
-        ellipse.set_colorkey(temp_colour)
-        pygame.draw.ellipse(ellipse, self.colour, (0, 0, width, height), width=self.pen_size)
-
-        surface.blit(ellipse, (x, y + self.BORDER_SIZE))
-
-        return ellipse, (x, y)
+        self.draw_preview(pygame.draw.ellipse, (x, y, width, height), self.pen_size)
 
 
-    def eye_dropper(self, _):
+    def eye_dropper(self):
         try:
             self.colour = tuple(list(self.canvas.get_at(self.pen_position))[:3])
 
             create_colour = (255, 0, 0) if max(self.colour) < 50 else self.colour
             self.picker.create(create_colour)
+            self.ui_changed = True
 
         except IndexError:
             pass
 
-        return self.shape, self.pos
 
+    def paint_bucket(self):
+        # opencv is slow to import and only needed here, so it is loaded on the first fill
+        import cv2
 
-    def paint_bucket(self, _):
-        arr = pygame.surfarray.array3d(self.canvas)
-        mask = numpy.zeros((arr.shape[0] + 2, arr.shape[1] + 2), dtype=numpy.uint8)
-        point = self.pen_position[1], self.pen_position[0]
-        cv2.floodFill(arr, mask, point, self.colour)
-        pygame.surfarray.blit_array(self.canvas, arr)
+        width, height = self.canvas.get_size()
 
-        return self.shape, self.pos
+        if self.fill_mask is None or self.fill_mask.shape != (height + 2, width + 2):
+            self.fill_mask = numpy.zeros((height + 2, width + 2), dtype=numpy.uint8)
 
+        # a transposed pixels2d view of a 32 bit surface is a contiguous (height, width) image,
+        # so the fill is written straight into the canvas without copying it
+        pixels = pygame.surfarray.pixels2d(self.canvas).T.view(numpy.int32)
+        _, _, _, (x, y, fill_width, fill_height) = cv2.floodFill(
+            pixels, self.fill_mask, self.pen_position, self.canvas.map_rgb(self.colour), flags=4
+        )
+        del pixels
 
-    def car(self, _):
-        self.car_position = self.mouse_x, self.mouse_y
+        self.fill_mask[y + 1:y + fill_height + 1, x + 1:x + fill_width + 1] = 0
+        self.mark_dirty(pygame.Rect(x, y, fill_width, fill_height))
 
-        return self.shape, self.pos
+
+    def car(self):
+        self.mark_dirty(self.car_rect, on_canvas=False)
+        self.car_position = self.mouse_x, self.mouse_y
+        self.mark_dirty(self.car_rect, on_canvas=False)
 
 
     def update_ui(self):
@@ -396,7 +480,8 @@ class DrawingEnvironment:
         elif self.buttons["load"].get_pressed(self.mouse_x, self.mouse_y) and self.tracks:
             try:
                 self.editing_track = f"tracks/track{self.current_track % self.tracks}.png"
-                self.canvas = pygame.transform.scale(pygame.image.load(self.editing_track), self.canvas.get_size())
+                self.canvas = pygame.transform.scale(pygame.image.load(self.editing_track), self.canvas.get_size()).convert()
+                self.redraw = True
                 self.current_track += 1
                 pygame.time.delay(100)
 
@@ -413,6 +498,7 @@ class DrawingEnvironment:
 
         create_colour = (255, 0, 0) if max(self.colour) < 50 else self.colour
         self.picker.create(create_colour)
+        self.ui_changed = True
 
 
     def update_car(self, event):
@@ -424,10 +510,12 @@ class DrawingEnvironment:
                 self.car_angle -= 10
 
 
-            self.car_image = pygame.transform.rotate(pygame.image.load("assets/car.png"), self.car_angle).convert_alpha()
+            self.mark_dirty(self.car_rect, on_canvas=False)
+            self.car_image = pygame.transform.rotate(load_image("assets/car.png"), self.car_angle)
+            self.mark_dirty(self.car_rect, on_canvas=False)
 
 
-    def update_canvas(self, surface):
+    def update_canvas(self):
         if pygame.mouse.get_pressed(5)[0]:
             next_colour = self.picker.select_colour(self.mouse_x, self.mouse_y)
 
@@ -435,10 +523,7 @@ class DrawingEnvironment:
                 self.colour = next_colour
 
             if self.mouse_y > self.BORDER_SIZE:
-                self.shape, self.pos = self.tools[self.draw_type](surface)
-
-            else:
-                surface.blit(self.shape, (self.pos[0], self.pos[1] + self.BORDER_SIZE))
+                self.tools[self.draw_type]()
 
             self.previous_position = self.pen_position
             self.pressed = True
@@ -446,12 +531,8 @@ class DrawingEnvironment:
 
         else:
             if self.pressed:
-                self.canvas.blit(self.shape, self.pos)
-                self.pressed = True
-
-                self.shape = pygame.Surface((0, 0))
-                self.shape.fill((255, 255, 255))
-                self.pos = 0, 0
+                self.commit_preview()
+                self.pressed = False
 
             self.previous_position = None
             self.start_position = None
@@ -459,17 +540,68 @@ class DrawingEnvironment:
 
     def update_picker(self):
         if self.colour_slider.rect.collidepoint(self.mouse_x, self.mouse_y):
+            self.ui_changed = True
             self.picker.reset()
             self.picker.update(int(self.colour_slider.get_distance() * 255 * 6))
 
 
+    @property
+    def car_rect(self):
+        if not self.car_position:
+            return pygame.Rect(0, 0, 0, 0)
+
+        return self.car_image.get_rect(topleft=self.car_position)
+
+
+    def update_cursor(self):
+        self.mark_dirty(self.cursor_rect, on_canvas=False)
+        self.cursor_rect = pygame.Rect(0, 0, self.pen_size, self.pen_size)
+        self.cursor_rect.center = self.mouse_x, self.mouse_y
+        self.mark_dirty(self.cursor_rect.inflate(2, 2), on_canvas=False)
+
+
+    def compose(self, surface):
+        if self.redraw:
+            self.dirty_rects = [surface.get_rect()]
+            self.ui_changed = True
+            self.redraw = False
+
+        if self.ui_changed:
+            self.draw_ui(self.ui_layer)
+            self.mark_dirty(self.ui_layer.get_rect(), on_canvas=False)
+            self.ui_changed = False
+
+        dirty_rects = [rect.clip(surface.get_rect()) for rect in self.dirty_rects]
+        self.dirty_rects = []
+
+        for rect in dirty_rects:
+            surface.set_clip(rect)
+            surface.blit(self.canvas, (self.canvas_x, self.canvas_y))
+            surface.blit(self.overlay, (self.canvas_x, self.canvas_y))
+
+            if self.car_position:
+                surface.blit(self.car_image, self.car_position)
+
+            pygame.draw.circle(surface, self.colour, (self.mouse_x, self.mouse_y), self.pen_size // 2, width=1)
+            surface.blit(self.ui_layer, (0, 0))
+
+        surface.set_clip(None)
+
+        return dirty_rects
+
+
     def update(self, surface):
         self.mouse_x, self.mouse_y = pygame.mouse.get_pos()
         self.pen_position = self.mouse_x, self.mouse_y - self.BORDER_SIZE
-        surface.blit(self.canvas, (self.canvas_x, self.canvas_y))
-        self.previous_canvas = self.canvas
+
+        mouse_pressed = any(pygame.mouse.get_pressed(5))
+        self.ui_changed = self.ui_changed or mouse_pressed or self.mouse_was_pressed
+        self.mouse_was_pressed = mouse_pressed
+
         self.update_buttons()
         self.update_picker()
-        self.update_canvas(surface)
+        self.update_canvas()
         self.update_ui()
-        self.draw_ui(surface)
+        self.update_cursor()
+
+        return self.compose(surface)
@@ -0,0 +1,167 @@
+import argparse as _argparse
+import json as _json
+import math as _math
+import multiprocessing as _multiprocessing
+import os as _os
+
+import numpy as _numpy
+import pygame as _pygame
+
+# bump when the generator's output changes so corpora made by different versions are never mixed up
+VERSION = 1
+
+CAR_SIZE = 35, 59
+ROAD_COLOUR = 255, 255, 255
+WALL_COLOUR = 0, 0, 0
+
+
+def centre_line(seed, width, height, road_width, curvature, points=720):
+    """
+    Builds a seeded closed loop as a star shaped curve, an ellipse perturbed by a few random harmonics.
+
+    Args:
+        seed (int): The random seed.
+        width (int): The image width.
+        height (int): The image height.
+        road_width (int): The road width, kept clear of the image edges.
+        curvature (float): The strength of the harmonics, 0 gives an ellipse and values towards 1 give tight bends.
+        points (int, optional): The number of points along the loop. Defaults to 720.
+
+    Returns:
+        numpy.ndarray: A (points, 2) array of image coordinates.
+    """
+
+    random = _numpy.random.default_rng(seed)
+    theta = _numpy.linspace(0, 2 * _math.pi, points, endpoint=False)
+
+    harmonics = _numpy.arange(2, 2 + random.integers(2, 6))
+    amplitudes = random.uniform(0, 1, len(harmonics)) * curvature / harmonics
+    phases = random.uniform(0, 2 * _math.pi, len(harmonics))
+
+    radius = 1 + (amplitudes[:, None] * _numpy.sin(harmonics[:, None] * theta + phases[:, None])).sum(axis=0)
+    radius = _numpy.maximum(radius / radius.max(), 0.3)
+
+    margin = road_width
+    x = width / 2 + (width / 2 - margin) * radius * _numpy.cos(theta)
+    y = height / 2 + (height / 2 - margin) * radius * _numpy.sin(theta)
+
+    return _numpy.stack([x, y], axis=1)
+
+
+def generate(path, seed, width=1400, height=750, road_width=90, curvature=0.6):
+    """
+    Draws a seeded circuit in the editor's track format and writes its spawn pose next to it.
+
+    The image is white road on black walls, like a canvas saved by the editor, and path.json holds the car's
+    start position and angle in the coordinates of Track.from_path, which puts the image under a toolbar
+    band when it is smaller than the default window.
+
+    Args:
+        path (str): The image path without an extension.
+        seed (int): The random seed.
+        width (int, optional): The image width. Defaults to 1400.
+        height (int, optional): The image height. Defaults to 750.
+        road_width (int, optional): The road width in pixels. Defaults to 90.
+        curvature (float, optional): How winding the circuit is, from 0 to 1. Defaults to 0.6.
+
+    Returns:
+        dict: The track's metadata.
+    """
+
+    line = centre_line(seed, width, height, road_width, curvature)
+
+    surface = _pygame.Surface((width, height))
+    surface.fill(WALL_COLOUR)
+
+    for point in line:
+        _pygame.draw.circle(surface, ROAD_COLOUR, point, road_width / 2)
+
+    _pygame.image.save(surface, path + ".png")
+
+    # cars drive towards -(sin(angle), cos(angle)) and are positioned by their image's top left corner
+    dx, dy = line[1] - line[0]
+    angle = _math.atan2(-dx, -dy)
+    top = max(900 - height, 0)
+
+    meta_data = {
+        "version": VERSION,
+        "seed": seed,
+        "width": width,
+        "height": height,
+        "road_width": road_width,
+        "curvature": curvature,
+        "start_position": [float(line[0][0] - CAR_SIZE[0] / 2), float(line[0][1] - CAR_SIZE[1] / 2 + top)],
+        "start_angle": angle
+    }
+
+    with open(path + ".json", "w") as file:
+        _json.dump(meta_data, file, indent=4)
+
+    return meta_data
+
+
+def load_pose(path):
+    """
+    Reads the spawn pose of a generated track.
+
+    Args:
+        path (str): The track's image path.
+
+    Returns:
+        tuple: The start position and start angle in radians.
+    """
+
+    with open(_os.path.splitext(path)[0] + ".json") as file:
+        meta_data = _json.load(file)
+
+    return tuple(meta_data["start_position"]), meta_data["start_angle"]
+
+
+def _generate(arguments):
+    return generate(*arguments)
+
+
+def generate_corpus(directory, count, seed=0, width=1400, height=750, road_width=90, curvature=0.6, processes=None):
+    """
+    Generates numbered tracks in parallel and a manifest describing the corpus.
+
+    Args:
+        directory (str): The output directory.
+        count (int): The number of tracks.
+        seed (int, optional): The seed of the first track, the rest count up from it. Defaults to 0.
+        processes (int, optional): The number of worker processes, all cores when None. Defaults to None.
+
+    Returns:
+        list: The metadata of every track.
+    """
+
+    _os.makedirs(directory, exist_ok=True)
+    jobs = [
+        (_os.path.join(directory, f"track{index}"), seed + index, width, height, road_width, curvature)
+        for index in range(count)
+    ]
+
+    with _multiprocessing.Pool(processes) as pool:
+        tracks = pool.map(_generate, jobs)
+
+    with open(_os.path.join(directory, "manifest.json"), "w") as file:
+        _json.dump({"version": VERSION, "tracks": [f"track{index}.png" for index in range(count)]}, file, indent=4)
+
+    return tracks
+
+
+if __name__ == "__main__":
+    parser = _argparse.ArgumentParser(description="Generates a reproducible corpus of closed loop tracks.")
+    parser.add_argument("directory")
+    parser.add_argument("--count", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--width", type=int, default=1400)
+    parser.add_argument("--height", type=int, default=750)
+    parser.add_argument("--road-width", type=int, default=90)
+    parser.add_argument("--curvature", type=float, default=0.6)
+    parser.add_argument("--processes", type=int, default=None)
+    args = parser.parse_args()
+
+    generate_corpus(
+        args.directory, args.count, args.seed, args.width, args.height, args.road_width, args.curvature, args.processes
+    )
\ No newline at end of file
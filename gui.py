@@ -1,5 +1,6 @@
 import functools as _functools
 
+import numpy as _numpy
 import  pygame as _pygame
 
 
@@ -248,10 +249,6 @@ class ColourPicker(_UIElement):
         self.increase = True
 
 
-    @_functools.lru_cache(maxsize=None)
-    def decrease_brightness(self, rgb, amount):
-        return tuple(x * (1 - amount) for x in rgb)
-
     @_functools.lru_cache(maxsize=None)
     def _rgb_to_hsl(self, red, green, blue):
         red, green, blue = red / 255.0, green / 255.0, blue / 255.0
@@ -277,7 +274,6 @@ class ColourPicker(_UIElement):
 
         return hue, saturation, lightness
 
-    @_functools.lru_cache(maxsize=None)
     def _hue_to_rgb(self, p, q, t):
         if t < 0:
             t += 1
@@ -291,34 +287,34 @@ class ColourPicker(_UIElement):
             return p + (q - p) * (2/3 - t) * 6
         return p
 
-    @_functools.lru_cache(maxsize=None)
     def _hsl_to_rgb(self, hue, saturation, lightness):
-        if saturation == 0:
-            red = green = blue = lightness
-        else:
-            q = lightness * (1 + saturation) if lightness < 0.5 else lightness + saturation - lightness * saturation
-            p = 2 * lightness - q
-            red = self._hue_to_rgb(p, q, hue + 1/3)
-            green = self._hue_to_rgb(p, q, hue)
-            blue = self._hue_to_rgb(p, q, hue - 1/3)
+        q = _numpy.where(lightness < 0.5, lightness * (1 + saturation), lightness + saturation - lightness * saturation)
+        p = 2 * lightness - q
 
-        return round(red * 255), round(green * 255), round(blue * 255)
+        rgb = _numpy.stack([
+            self._hue_to_rgb(p, q, hue + 1/3),
+            self._hue_to_rgb(p, q, hue),
+            self._hue_to_rgb(p, q, hue - 1/3)
+        ], axis=-1)
+        rgb[saturation == 0] = lightness
 
-    @_functools.lru_cache(maxsize=None)
-    def decrease_saturation(self, rgb, amount):
-        hue, saturation, lightness = self._rgb_to_hsl(*rgb)
-        new_saturation = max(0, saturation - amount)
-        new_rgb = self._hsl_to_rgb(hue, new_saturation, lightness)
-        return new_rgb
+        return _numpy.round(rgb * 255)
 
-    def create(self, start_colour):
-        start_colour = tuple(start_colour)
-        for i in range(self.WIDTH):
+    @_functools.lru_cache(maxsize=32)
+    def _gradient(self, start_colour):
+        hue, saturation, lightness = self._rgb_to_hsl(*start_colour)
+
+        saturations = _numpy.maximum(0, saturation - _numpy.arange(self.WIDTH) / self.WIDTH)
+        columns = self._hsl_to_rgb(hue, saturations, lightness)
+
+        brightness = _numpy.cumprod(1 - _numpy.arange(self.HEIGHT) / self.HEIGHT / 30)
+        gradient = (columns[:, _numpy.newaxis, :] * brightness[:, _numpy.newaxis]).astype(_numpy.uint8)
+        gradient.flags.writeable = False
 
-            colour = self.decrease_saturation(start_colour, (i / self.WIDTH))
-            for j in range(self.HEIGHT):
-                colour = self.decrease_brightness(colour, (j / self.HEIGHT/ 30))
-                self.surface.set_at((i, j), colour)
+        return gradient
+
+    def create(self, start_colour):
+        _pygame.surfarray.blit_array(self.surface, self._gradient(tuple(start_colour)))
 
 
     def update(self, offset=0):
@@ -0,0 +1,117 @@
+import glob as _glob
+import os as _os
+
+import numpy as _numpy
+
+from population import ACTIONS
+
+
+def encode_action(directions) -> _numpy.ndarray:
+    """
+    Encodes a pair of directions as the network output that would produce them.
+
+    Args:
+        directions (list): The throttle and steering directions, as returned by Car.ai_move or Car.keyboard_move.
+
+    Returns:
+        numpy.ndarray: 1 for each chosen action and -1 for the rest, matching the tanh output layer.
+    """
+
+    target = -_numpy.ones(sum(len(actions) for actions in ACTIONS), dtype=_numpy.float32)
+    offset = 0
+
+    for actions, direction in zip(ACTIONS, directions):
+        if direction in actions:
+            target[offset + actions.index(direction)] = 1
+
+        offset += len(actions)
+
+    return target
+
+
+class TrajectoryRecorder:
+    """Streams (sensor state, action) pairs to a directory of fixed size chunks."""
+
+    def __init__(self, path: str, state_size: int = 32, chunk_size: int = 4096) -> None:
+        """
+        Initializes the recorder, new chunks are numbered after any already in the directory.
+
+        Args:
+            path (str): The dataset directory.
+            state_size (int, optional): The number of sensor readings per state. Defaults to 32.
+            chunk_size (int, optional): The number of samples written per chunk. Defaults to 4096.
+        """
+
+        self.path = path
+        _os.makedirs(path, exist_ok=True)
+
+        self.states = _numpy.empty((chunk_size, state_size), dtype=_numpy.float32)
+        self.actions = _numpy.empty((chunk_size, sum(len(actions) for actions in ACTIONS)), dtype=_numpy.float32)
+        self.length = 0
+        self.chunk = len(_glob.glob(_os.path.join(path, "chunk*.npz")))
+
+    def record(self, state: _numpy.ndarray, directions) -> None:
+        """
+        Adds one sample, writing the chunk to disk once it is full.
+
+        Args:
+            state (numpy.ndarray): The car's sensor state.
+            directions (list): The throttle and steering directions taken in that state.
+        """
+
+        self.states[self.length] = state.ravel()
+        self.actions[self.length] = encode_action(directions)
+        self.length += 1
+
+        if self.length == len(self.states):
+            self.flush()
+
+    def flush(self) -> None:
+        """Writes the recorded samples that are not on disk yet as a new chunk."""
+
+        if self.length:
+            _numpy.savez(
+                _os.path.join(self.path, f"chunk{self.chunk:05d}"),
+                states=self.states[:self.length],
+                actions=self.actions[:self.length]
+            )
+
+            self.chunk += 1
+            self.length = 0
+
+
+def load_chunks(path: str):
+    """
+    Streams a recorded dataset one chunk at a time, so it never has to fit in memory.
+
+    Args:
+        path (str): The dataset directory.
+
+    Yields:
+        tuple: The (states, actions) arrays of a chunk, one sample per row.
+    """
+
+    for chunk in sorted(_glob.glob(_os.path.join(path, "chunk*.npz"))):
+        with _numpy.load(chunk) as data:
+            yield data["states"], data["actions"]
+
+
+def pretrain(brain, path: str, epochs: int, *, learning_rate=0.1, batch_size=64, display=False) -> None:
+    """
+    Fits a network to a recorded dataset by imitation.
+
+    Args:
+        brain (NeuralNetwork): The network to train.
+        path (str): The dataset directory.
+        epochs (int): The number of passes over the whole dataset.
+        learning_rate (float, optional): The amount the model should change in response to the error. Defaults to 0.1.
+        batch_size (int, optional): The number of samples per gradient step. Defaults to 64.
+        display (bool, optional): Whether to display progress. Defaults to False.
+    """
+
+    for epoch in range(epochs):
+        for states, actions in load_chunks(path):
+            brain.train(states, actions, 1, learning_rate=learning_rate, batch_size=batch_size)
+
+        if display:
+            print(f"{epoch + 1} / {epochs}")
\ No newline at end of file
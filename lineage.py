@@ -0,0 +1,201 @@
+import collections as _collections
+
+import numpy as _numpy
+
+TABLE_SIZE = 1 << 21
+TABLE_SEED = 0
+
+# one mutation step: the index of the parent among the bases sent with it, the noise table offset seed and the scale
+RECORD = _numpy.dtype([("parent", "<u4"), ("seed", "<u4"), ("scale", "<f4")])
+
+
+class NoiseTable:
+    """A block of uniform noise in [-1, 1) that every process generates identically from the same seed.
+
+    A mutation is then fully described by an offset into the table and a scale, the same distribution
+    NeuroEvoloution.mutate draws from.
+    """
+
+    def __init__(self, size: int = TABLE_SIZE, seed: int = TABLE_SEED) -> None:
+        self.noise = _numpy.random.default_rng(seed).random(size, dtype=_numpy.float32) * 2 - 1
+
+    def sample(self, seed: int, count: int) -> _numpy.ndarray:
+        offset = int(seed) % (len(self.noise) - count + 1)
+        return self.noise[offset:offset + count]
+
+    def expand(self, bases: _numpy.ndarray, records: _numpy.ndarray) -> _numpy.ndarray:
+        """
+        Rebuilds genomes from their parents and one mutation step each.
+
+        Args:
+            bases (numpy.ndarray): A (parents, parameters) array.
+            records (numpy.ndarray): A RECORD array with one entry per genome.
+
+        Returns:
+            numpy.ndarray: A (genomes, parameters) array.
+        """
+
+        genomes = bases[records["parent"]].astype(_numpy.float64)
+
+        for genome, record in zip(genomes, records):
+            if record["scale"]:
+                genome += _numpy.float64(record["scale"]) * self.sample(record["seed"], len(genome))
+
+        return genomes
+
+
+class Lineage:
+    """Genomes stored as their parent's id, a noise table seed and a scale instead of their parameters.
+
+    Only roots, genomes that did not come from a mutation, keep their parameters. Any other genome is
+    rebuilt on demand by replaying the mutations from its root, with recently rebuilt genomes cached so
+    a generation of children of the same champion only replays the champion once.
+    """
+
+    def __init__(self, table: NoiseTable = None, max_cached: int = 64) -> None:
+        """
+        Initializes an empty lineage.
+
+        Args:
+            table (NoiseTable, optional): The shared noise table, a default one when None. Defaults to None.
+            max_cached (int, optional): The number of rebuilt genomes kept. Defaults to 64.
+        """
+
+        self.table = table or NoiseTable()
+        self.roots = {}
+        self.records = {}
+        self.next_id = 0
+
+        self.cached = _collections.OrderedDict()
+        self.max_cached = max_cached
+
+    def add_root(self, parameters: _numpy.ndarray) -> int:
+        self.roots[self.next_id] = _numpy.array(parameters, dtype=_numpy.float64)
+        self.next_id += 1
+
+        return self.next_id - 1
+
+    def add_child(self, parent_id: int, scale: float, seed: int = None) -> int:
+        """
+        Records a mutated child of a genome.
+
+        Args:
+            parent_id (int): The parent's id.
+            scale (float): The mutation amount, stored as float32 so every process applies the same value.
+            seed (int, optional): The noise table seed, a random one when None. Defaults to None.
+
+        Returns:
+            int: The child's id.
+        """
+
+        if seed is None:
+            seed = _numpy.random.randint(1 << 32, dtype=_numpy.uint64)
+
+        self.records[self.next_id] = (parent_id, int(seed), _numpy.float32(scale))
+        self.next_id += 1
+
+        return self.next_id - 1
+
+    def parameters(self, genome_id: int) -> _numpy.ndarray:
+        """
+        Rebuilds a genome's parameters.
+
+        Args:
+            genome_id (int): The genome's id.
+
+        Returns:
+            numpy.ndarray: The parameters, which must not be modified in place.
+        """
+
+        steps = []
+
+        while genome_id not in self.roots and genome_id not in self.cached:
+            steps.append(genome_id)
+            genome_id = self.records[genome_id][0]
+
+        parameters = self.roots[genome_id] if genome_id in self.roots else self.cached[genome_id]
+
+        for step in reversed(steps):
+            _, seed, scale = self.records[step]
+            parameters = parameters + _numpy.float64(scale) * self.table.sample(seed, len(parameters))
+
+            self.cached[step] = parameters
+            if len(self.cached) > self.max_cached:
+                self.cached.popitem(last=False)
+
+        return parameters
+
+    def split(self, genome_ids) -> tuple:
+        """
+        Encodes genomes as the parameters of their distinct parents and one mutation step each.
+
+        Roots are sent as their own parent with a zero scale.
+
+        Args:
+            genome_ids (list): The genomes' ids.
+
+        Returns:
+            tuple: A (parents, parameters) array of bases and a RECORD array for NoiseTable.expand.
+        """
+
+        bases = {}
+        records = _numpy.zeros(len(genome_ids), dtype=RECORD)
+
+        for record, genome_id in zip(records, genome_ids):
+            parent_id, seed, scale = self.records.get(genome_id, (genome_id, 0, 0))
+            record["parent"] = bases.setdefault(parent_id, len(bases))
+            record["seed"], record["scale"] = seed, scale
+
+        return _numpy.stack([self.parameters(parent_id) for parent_id in bases]), records
+
+    def prune(self, genome_ids) -> None:
+        """Drops every genome that is not one of genome_ids or one of their ancestors."""
+
+        keep = set()
+
+        for genome_id in genome_ids:
+            while genome_id not in keep:
+                keep.add(genome_id)
+
+                if genome_id in self.roots:
+                    break
+
+                genome_id = self.records[genome_id][0]
+
+        self.roots = {genome_id: parameters for genome_id, parameters in self.roots.items() if genome_id in keep}
+        self.records = {genome_id: record for genome_id, record in self.records.items() if genome_id in keep}
+        self.cached = _collections.OrderedDict((genome_id, parameters) for genome_id, parameters in self.cached.items() if genome_id in keep)
+
+    def save(self, path: str) -> None:
+        """
+        Writes the lineage to path.npz, parameters only for the roots.
+
+        Args:
+            path (str): The file path without an extension.
+        """
+
+        ids = _numpy.array(list(self.records), dtype=_numpy.uint64)
+        parents = _numpy.array([record[0] for record in self.records.values()], dtype=_numpy.uint64)
+        seeds = _numpy.array([record[1] for record in self.records.values()], dtype=_numpy.uint32)
+        scales = _numpy.array([record[2] for record in self.records.values()], dtype=_numpy.float32)
+
+        _numpy.savez(
+            path,
+            root_ids=_numpy.array(list(self.roots), dtype=_numpy.uint64),
+            roots=_numpy.array(list(self.roots.values())).reshape(len(self.roots), -1),
+            ids=ids, parents=parents, seeds=seeds, scales=scales, next_id=self.next_id
+        )
+
+    @classmethod
+    def load(cls, path: str, table: NoiseTable = None) -> "Lineage":
+        data = _numpy.load(path + ".npz")
+        lineage = cls(table)
+
+        lineage.roots = {int(genome_id): parameters for genome_id, parameters in zip(data["root_ids"], data["roots"])}
+        lineage.records = {
+            int(genome_id): (int(parent_id), int(seed), scale)
+            for genome_id, parent_id, seed, scale in zip(data["ids"], data["parents"], data["seeds"], data["scales"])
+        }
+        lineage.next_id = int(data["next_id"])
+
+        return lineage
\ No newline at end of file
@@ -1,3 +1,4 @@
+import argparse
 import sys
 import time
 import math
@@ -5,9 +6,49 @@ import math
 import pygame
 import numpy
 
+from cache import FitnessCache, SensorCache, simulation_key
 from enviroment import DrawingEnvironment, Track
-from population import Population
-from gui import Graph
+from imitation import TrajectoryRecorder, pretrain
+from memory import measure, parse_size, population_for_budget, track_bytes
+from metrics import MetricsServer
+from population import PROGRESS_WINDOW, STATIONARY_FRAMES, Car, Population
+from renderer import FrameWriter, draw_stats, serve
+from spritesheet import load_image
+from trajectory import Replay
+
+parser = argparse.ArgumentParser(description="Visualise a genetic algorithm through self driving cars.")
+parser.add_argument("--record", metavar="DIR", help="drive a car with the arrow keys and record its sensor states and actions to DIR")
+parser.add_argument("--champion", action="store_true", help="record the saved model driving instead of the keyboard")
+parser.add_argument("--pretrain", metavar="DIR", help="fit the first generation to the driving recorded in DIR")
+parser.add_argument("--epochs", type=int, default=20, help="number of pretraining epochs")
+parser.add_argument("--replay", metavar="PATH", help="replay a champion trajectory saved during training")
+parser.add_argument("--save-trajectory", action="store_true", help="record drives while training so the champion's can be replayed")
+parser.add_argument("--track", default="tracks/track0.png", help="track to draw the replay on")
+parser.add_argument("--speed", type=float, default=1, help="replay speed multiplier")
+parser.add_argument("--render-process", action="store_true", help="train at full speed and draw it from a separate process")
+parser.add_argument("--steady-state", action="store_true", help="replace each crashed car at once instead of breeding whole generations")
+parser.add_argument("--evolve-topology", action="store_true", help="evolve sparse NEAT style networks instead of fixed dense ones")
+parser.add_argument("--pipeline", action="store_true",
+                    help="breed the next generation in the background while the last cars drive, at the cost of a second pool of cars")
+parser.add_argument("--metrics-port", type=int, metavar="PORT", help="serve training metrics on http://127.0.0.1:PORT/metrics")
+parser.add_argument("--sensor-cache", type=float, nargs=2, metavar=("PIXELS", "DEGREES"),
+                    help="reuse sensor readings of poses rounded to a grid of this many pixels and degrees")
+parser.add_argument("--decision-interval", type=int, default=1, metavar="K", help="run each car's sensors and brain every K frames, holding its action in between")
+parser.add_argument("--stagger-decisions", action="store_true", help="spread the cars' decision frames over the interval")
+parser.add_argument("--memory-budget", type=parse_size, metavar="SIZE", help="size the population to fit in SIZE of memory, e.g. 2G")
+parser.add_argument("--frames", metavar="PATH", help="draw sampled generations and new champions offscreen to a directory or .zip of PNGs")
+parser.add_argument("--frames-every", type=int, default=10, metavar="N", help="generations between the ones --frames captures")
+parser.add_argument("--frames-stride", type=int, default=1, metavar="N", help="simulation steps per frame --frames writes")
+args = parser.parse_args()
+
+if args.pretrain and args.evolve_topology:
+    parser.error("--pretrain fits dense networks by backpropagation, it does not work with --evolve-topology")
+
+if args.steady_state and args.evolve_topology:
+    parser.error("evolved topologies vary in size, so --evolve-topology only works with generational training")
+
+if args.pipeline and (args.steady_state or args.evolve_topology):
+    parser.error("--pipeline only works with generational training of fixed size networks")
 
 pygame.init()
 numpy.random.seed(0)
@@ -29,9 +70,30 @@ start_button.set_colorkey((255, 60, 60))
 prev_time = time.time()
 train = False
 start = False
+recorder = None
+replay = None
+frames = None
+
+if args.replay:
+    track = Track.from_path(args.track)
+    replay = Replay(args.replay, load_image("assets/car.png"))
+
+
+def spawn_driver():
+    driver = Car(track, *start_pose)
+
+    if args.champion:
+        driver.brain.load("models/model")
+
+    return driver
+
 
 while True:
-    win.fill((255, 255, 255))
+    dirty_rects = None
+
+    if not start or paint.saved:
+        win.fill((255, 255, 255))
+
     mouse_x, mouse_y = pygame.mouse.get_pos()
     keys = pygame.key.get_pressed()
     current_time = time.time()
@@ -41,6 +103,12 @@ while True:
 
     for event in pygame.event.get():
         if event.type == pygame.QUIT:
+            if recorder:
+                recorder.flush()
+
+            if frames:
+                frames.close()
+
             pygame.quit()
             sys.exit(0)
 
@@ -55,7 +123,13 @@ while True:
                 paint.update_car(event)
 
 
-    if not start:
+    if replay:
+        track.draw(win, 0, 0)
+        replay.update(win, args.speed, dt)
+        win.blit(font.render(f"frame: {int(replay.frame)}/{len(replay.poses)}", True, (255, 255, 255)), (10, 0))
+
+
+    elif not start:
         win.fill((85, 85, 85))
         win.blit(title, (50, 10))
         win.blit(start_button, (359, 475))
@@ -65,46 +139,106 @@ while True:
 
 
     elif not paint.saved:
-        paint.update(win)
-        pygame.draw.circle(win, (paint.colour), (mouse_x, mouse_y), paint.pen_size // 2, width=1)
-        paint.draw_ui(win)
+        dirty_rects = paint.update(win)
 
 
     elif not train:
         track = Track(paint.canvas)
+        start_pose = paint.car_position, paint.car_angle*math.pi/180
+        car_options = {
+            "evolve_topology": args.evolve_topology,
+            "decision_interval": args.decision_interval,
+            "record_trajectory": args.save_trajectory or bool(args.frames),
+        }
+
+        if args.sensor_cache:
+            car_options["sensor_cache"] = SensorCache(args.sensor_cache[0], math.radians(args.sensor_cache[1]))
+
+        population_size = 350
+
+        if args.memory_budget:
+            sizes = measure(track, *start_pose, **car_options)
+            population_size = population_for_budget(args.memory_budget, sizes, track_bytes(track), 2 if args.pipeline else 1)
 
         population = Population(
-            350,
+            population_size,
             track,
-            paint.car_position,
-            paint.car_angle*math.pi/180
+            *start_pose,
+            steady_state=args.steady_state,
+            model_path="models/neat_model" if args.evolve_topology else "models/model",
+            car_options=car_options,
+            pipeline=args.pipeline,
+            stagger_decisions=args.stagger_decisions
         )
 
+        if args.metrics_port is not None:
+            MetricsServer(population, port=args.metrics_port)
+
+        if args.frames:
+            frames = FrameWriter(track, args.frames, args.frames_every, stride=args.frames_stride)
+
+        if args.record:
+            recorder = TrajectoryRecorder(args.record, population.cars[0].DIRECTIONS)
+            driver = spawn_driver()
+
+        elif args.pretrain:
+            pretrain(population.cars[0].brain, args.pretrain, args.epochs, display=True)
+            population.cars[0].brain.save(population.model_path)
+            population.load_cars()
+
+        if args.render_process:
+            key = simulation_key(
+                track, *start_pose, STATIONARY_FRAMES, PROGRESS_WINDOW, args.sensor_cache, args.decision_interval,
+                args.stagger_decisions
+            )
+            population.fitness_cache = FitnessCache(key)
+            population.lookup_fitnesses()
+            pygame.display.quit()
+            serve(population, track, FPS, frames)
+
+            if frames:
+                frames.close()
+
+            pygame.quit()
+            sys.exit(0)
+
         train = True
 
 
-    if train:
-        increment = paint.BORDER_SIZE // (population.generation)
-        graph = Graph(paint.BORDER_SIZE + 1, increment)
-        points = [0] + population.history
+    if train and recorder:
+        track.draw(win, 0, 0)
+
+        state = driver.get_state()
+        directions = driver.ai_move(state) if args.champion else driver.keyboard_move(keys)
+        recorder.record(state, directions)
+        driver.update(win, dt, directions)
 
-        if len(points) > 1:
-            graph.plot_y([point * (graph.size / max(population.history)) for point in points])
+        if driver.has_collided or not driver.in_bounds:
+            recorder.flush()
+            driver = spawn_driver()
 
+
+    elif train:
         track.draw(win, 0, 0)
         population.train(win, dt)
 
-        data = [
-            font.render(f"generation: {population.generation} ", True, (255, 255, 255)),
-            font.render(f"population: {len(population.cars)}/{population.population_size}", True, (255, 255, 255)),
-            font.render(f"best fitness: {round(population.best_fitness, 2)}", True, (255, 255, 255)),
-            font.render(f"best current fitness: {round(population.best_current_fitness, 2)} ", True, (255, 255, 255)),
-        ]
+        if frames:
+            frames.capture(population)
 
-        for i, datum in enumerate(data):
-            win.blit(datum, (10, i * 35))
+        stats = {
+            "generation": population.generation,
+            "alive": len(population.cars),
+            "population_size": population.population_size,
+            "best_fitness": population.best_fitness,
+            "best_current_fitness": population.best_current_fitness
+        }
 
-        graph.draw(win, WIDTH - graph.size, 0)
+        draw_stats(win, font, stats, population.history, paint.BORDER_SIZE + 1)
 
     clock.tick(FPS)
-    pygame.display.flip()
\ No newline at end of file
+
+    if dirty_rects is None:
+        pygame.display.flip()
+
+    else:
+        pygame.display.update(dirty_rects)
\ No newline at end of file
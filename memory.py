@@ -0,0 +1,280 @@
+import argparse as _argparse
+import math as _math
+import re as _re
+import sys as _sys
+import tracemalloc as _tracemalloc
+
+import numpy as _numpy
+import pygame as _pygame
+
+from generator import load_pose
+from population import MAX_FRAMES, Car, measure_progress
+from trajectory import TrajectoryBuffer
+
+
+# what a car is made of, the surfaces live in SDL's heap so tracemalloc never sees them
+COMPONENTS = ("image", "rotated_image", "parameters", "activations", "trajectory", "objects")
+
+UNITS = {"": 1, "K": 1 << 10, "M": 1 << 20, "G": 1 << 30}
+
+
+def parse_size(text: str) -> int:
+    """
+    Reads a byte count such as 512M or 2G.
+
+    Args:
+        text (str): A number with an optional K, M or G suffix.
+
+    Returns:
+        int: The number of bytes.
+    """
+
+    match = _re.fullmatch(r"\s*([0-9.]+)\s*([KMG]?)i?B?\s*", text.upper())
+
+    if match is None:
+        raise ValueError(f"not a size: {text!r}")
+
+    return int(float(match.group(1)) * UNITS[match.group(2)])
+
+
+def format_size(size: float) -> str:
+    for unit in ("G", "M", "K"):
+        if abs(size) >= UNITS[unit]:
+            return f"{size / UNITS[unit]:.1f} {unit}iB"
+
+    return f"{size:.0f} B"
+
+
+def surface_bytes(surface) -> int:
+    return 0 if surface is None else surface.get_pitch() * surface.get_height()
+
+
+def array_bytes(*arrays) -> int:
+    return sum(array.nbytes for array in arrays if isinstance(array, _numpy.ndarray))
+
+
+def network_bytes(brain):
+    """
+    Splits a brain's arrays into the parameters it evolves and the activations it keeps between calls.
+
+    Args:
+        brain (NeuroEvoloution or NeatNetwork): The network.
+
+    Returns:
+        tuple: The parameter bytes, activation bytes and the Python objects holding them.
+    """
+
+    if hasattr(brain, "network"):
+        layers = brain.network
+        parameters = sum(array_bytes(layer.weights, layer.biases) for layer in layers)
+        activations = sum(
+            array_bytes(layer.buffer, getattr(layer, "inputs", None), getattr(layer, "outputs", None)) for layer in layers
+        )
+
+        return parameters, activations, [brain, *layers]
+
+    parameters = array_bytes(
+        brain.sources, brain.targets, brain.weights, brain.enabled, brain.innovations,
+        brain.plan_genes, brain.plan_sources, brain.plan_weights
+    )
+
+    return parameters, array_bytes(brain.values), [brain]
+
+
+def object_bytes(objects) -> int:
+    # the instances themselves, their attribute dicts when they have one, and nothing they point to
+    return sum(_sys.getsizeof(item) + (_sys.getsizeof(vars(item)) if hasattr(item, "__dict__") else 0) for item in objects)
+
+
+def car_bytes(car) -> dict:
+    """
+    Accounts for the memory one car holds on to.
+
+    Args:
+        car (Car): The car.
+
+    Returns:
+        dict: The bytes of every component in COMPONENTS.
+    """
+
+    parameters, activations, objects = network_bytes(car.brain)
+
+    return {
+        "image": surface_bytes(car.image),
+        "rotated_image": 0 if car.rotated_image is car.image else surface_bytes(car.rotated_image),
+        "parameters": parameters,
+        "activations": activations,
+        "trajectory": 0 if car.trajectory is None else car.trajectory.data.nbytes,
+        "objects": object_bytes([car, *([] if car.trajectory is None else [car.trajectory]), *objects]),
+    }
+
+
+def track_bytes(track) -> int:
+    mask = getattr(track, "mask", None)
+    mask_bytes = 0 if mask is None else _math.ceil(mask.get_size()[0] / 8) * mask.get_size()[1]
+
+    return surface_bytes(getattr(track, "image", None)) + mask_bytes + array_bytes(track.progress)
+
+
+def report(population) -> dict:
+    """
+    Adds up the memory of every car a population holds, its reused pools, the spare and a champion kept aside.
+
+    Args:
+        population (Population): The population.
+
+    Returns:
+        dict: The total bytes of every component in COMPONENTS plus "track", "sensor_cache" and "cars", the number
+        of cars counted.
+    """
+
+    cars = {id(car): car for car in [*population.pool, *(population.standby or []), population.spare, *population.cars]}
+
+    if population.champion is not None:
+        cars[id(population.champion)] = population.champion
+
+    totals = dict.fromkeys(COMPONENTS, 0)
+
+    for car in cars.values():
+        for component, size in car_bytes(car).items():
+            totals[component] += size
+
+    totals["track"] = track_bytes(population.car_data[0])
+
+    sensor_cache = population.car_options.get("sensor_cache")
+    totals["sensor_cache"] = 0 if sensor_cache is None else sum(reading.nbytes for reading in sensor_cache.readings.values())
+    totals["cars"] = len(cars)
+
+    return totals
+
+
+def peak_trajectory_bytes(frames: int = MAX_FRAMES) -> int:
+    capacity = TrajectoryBuffer().data.shape[0]
+
+    while capacity < frames:
+        capacity *= 2
+
+    return capacity * TrajectoryBuffer.FIELDS * _numpy.dtype(_numpy.float32).itemsize
+
+
+def measure(track, start_position, start_angle, cars: int = 16, **car_options) -> dict:
+    """
+    Builds and steps a few cars to find what one costs, including the heap tracemalloc sees that nbytes cannot.
+
+    Args:
+        track (Track): The track to build the cars on.
+        start_position (tuple): The start position.
+        start_angle (float): The start angle.
+        cars (int, optional): The number of cars to average over. Defaults to 16.
+        **car_options: Passed on to Car.
+
+    Returns:
+        dict: The mean bytes per car of every component in COMPONENTS, "traced", the Python heap growth per car,
+        and "peak", a car's footprint once any trajectory it records has grown to MAX_FRAMES.
+    """
+
+    measure_progress(track, start_position, start_angle)
+    # the first car loads the shared car image, which no later car pays for
+    Car(track, start_position, start_angle, **car_options).update(None, 1)
+
+    _tracemalloc.start()
+    before = _tracemalloc.get_traced_memory()[0]
+    sample = [Car(track, start_position, start_angle, **car_options) for _ in range(cars)]
+
+    for car in sample:
+        car.update(None, 1)
+
+    traced = _tracemalloc.get_traced_memory()[0] - before
+    _tracemalloc.stop()
+
+    sizes = dict.fromkeys(COMPONENTS, 0)
+
+    for car in sample:
+        for component, size in car_bytes(car).items():
+            sizes[component] += size / cars
+
+    sizes["traced"] = traced / cars
+    sizes["peak"] = sum(sizes[component] for component in COMPONENTS)
+
+    if sample[0].trajectory is not None:
+        sizes["peak"] += peak_trajectory_bytes() - sizes["trajectory"]
+
+    return sizes
+
+
+def fit_count(budget: int, per_item: float, fixed: int = 0) -> int:
+    """
+    Finds how many items of a given size fit in a budget.
+
+    Args:
+        budget (int): The bytes available.
+        per_item (float): The bytes each item takes.
+        fixed (int, optional): Bytes taken regardless of the count. Defaults to 0.
+
+    Returns:
+        int: The number of items, at least 1.
+    """
+
+    return max(int((budget - fixed) // per_item), 1)
+
+
+def population_for_budget(budget: int, sizes: dict, fixed: int = 0, pools: int = 1) -> int:
+    """
+    Picks the largest population whose cars fit in a memory budget once every trajectory is full grown.
+
+    Besides the population, a Population holds a spare car and may keep its champion aside.
+
+    Args:
+        budget (int): The bytes available.
+        sizes (dict): The per car sizes measure returned.
+        fixed (int, optional): Bytes taken regardless of the population size, such as the track. Defaults to 0.
+        pools (int, optional): The number of cars kept per member, 2 with a pipelined turnover. Defaults to 1.
+
+    Returns:
+        int: The population size.
+    """
+
+    return max((fit_count(budget, sizes["peak"], fixed) - 2) // pools, 1)
+
+
+if __name__ == "__main__":
+    from enviroment import Track
+
+    parser = _argparse.ArgumentParser(description="Breaks down what a population of cars costs in memory.")
+    parser.add_argument("track")
+    parser.add_argument("--start", type=float, nargs=3, metavar=("X", "Y", "ANGLE"),
+                        help="start position and angle in degrees, read from the track's .json when left out")
+    parser.add_argument("--population", type=int, default=350)
+    parser.add_argument("--evolve-topology", action="store_true")
+    parser.add_argument("--record-trajectory", action="store_true", help="count the drives recorded for replays")
+    parser.add_argument("--budget", type=parse_size, metavar="SIZE", help="also pick the population and batch size that fit, e.g. 2G")
+    args = parser.parse_args()
+
+    _pygame.init()
+    track = Track.from_path(args.track)
+
+    if args.start:
+        start_position, start_angle = (args.start[0], args.start[1]), _math.radians(args.start[2])
+
+    else:
+        start_position, start_angle = load_pose(args.track)
+
+    sizes = measure(track, start_position, start_angle, evolve_topology=args.evolve_topology,
+                    record_trajectory=args.record_trajectory)
+    fixed = track_bytes(track)
+    cars = args.population + 2
+    total = sum(sizes[component] for component in COMPONENTS)
+
+    print(f"{'component':<16}{'per car':>12}{'population':>14}")
+
+    for component in COMPONENTS:
+        print(f"{component:<16}{format_size(sizes[component]):>12}{format_size(sizes[component] * cars):>14}")
+
+    print(f"{'track':<16}{'':>12}{format_size(fixed):>14}")
+    print(f"{'total':<16}{format_size(total):>12}{format_size(total * cars + fixed):>14}")
+    print(f"{'full trajectory':<16}{format_size(sizes['peak']):>12}{format_size(sizes['peak'] * cars + fixed):>14}")
+    print(f"python heap traced by tracemalloc: {format_size(sizes['traced'])} per car")
+
+    if args.budget:
+        print(f"population that fits {format_size(args.budget)}: {population_for_budget(args.budget, sizes, fixed)}")
+        print(f"worker --batch-size that fits {format_size(args.budget)}: {fit_count(args.budget, sizes['peak'], fixed)}")
\ No newline at end of file
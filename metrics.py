@@ -0,0 +1,139 @@
+import http.server as _server
+import json as _json
+import math as _math
+import os as _os
+import sys as _sys
+import threading as _threading
+
+from population import PHASES
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def format_value(value):
+    # fitnesses start at -inf, which the text format spells -Inf
+    value = float(value)
+    return ("+Inf" if value > 0 else "-Inf") if value in (float("inf"), -float("inf")) else repr(value)
+
+
+def json_value(value):
+    # JSON has no infinities, so fitnesses nothing has reached yet go out as null
+    value = float(value)
+    return value if _math.isfinite(value) else None
+
+
+def resident_memory():
+    """The process's resident set size in bytes, its peak where the current size can't be read, or None."""
+
+    try:
+        with open("/proc/self/statm") as file:
+            return int(file.read().split()[1]) * _os.sysconf("SC_PAGE_SIZE")
+
+    except (OSError, ValueError):
+        pass
+
+    try:
+        import resource
+
+    except ImportError:
+        return None
+
+    # kilobytes on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if _sys.platform == "darwin" else peak * 1024
+
+
+class MetricsServer:
+    """Serves a population's training metrics over HTTP from a background thread.
+
+    GET /metrics returns them in the Prometheus text format and GET /history returns the best fitness of
+    every generation as JSON. Progress is exported as monotonic counters, so scraping never changes what is reported
+    and any number of scrapers can take rates over windows of their own.
+    """
+
+    def __init__(self, population, host="127.0.0.1", port=9100):
+        """
+        Starts serving.
+
+        Args:
+            population (Population): The population to report on.
+            host (str, optional): The address to listen on, keep it local unless the network is trusted. Defaults to "127.0.0.1".
+            port (int, optional): The port to listen on, 0 picks a free one. Defaults to 9100.
+        """
+
+        self.population = population
+
+        metrics = self
+
+        class Handler(_server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path == "/metrics":
+                    body, content_type = metrics.render().encode(), CONTENT_TYPE
+
+                elif self.path == "/history":
+                    body, content_type = _json.dumps(metrics.history()).encode(), "application/json"
+
+                else:
+                    self.send_error(404)
+                    return
+
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = _server.ThreadingHTTPServer((host, port), Handler)
+        self.address = self.server.server_address
+        _threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def render(self):
+        population = self.population
+
+        metrics = [
+            ("generation", "gauge", "The current generation.", population.generation),
+            ("best_fitness", "gauge", "The best fitness of any car so far.", population.best_fitness),
+            ("current_fitness", "gauge", "The best fitness in the current generation.", population.best_current_fitness),
+            ("live_cars", "gauge", "The cars still driving.", len(population.cars)),
+            ("steps_total", "counter", "Car steps simulated in this process.", population.steps),
+            ("evaluations_total", "counter", "Genomes evaluated.", population.evaluations),
+            ("generations_total", "counter", "Generations completed.", population.generation - 1),
+        ]
+
+        lines = []
+
+        for name, kind, description, value in metrics:
+            lines += [f"# HELP neuroevolution_{name} {description}", f"# TYPE neuroevolution_{name} {kind}"]
+            lines.append(f"neuroevolution_{name} {format_value(value)}")
+
+        lines += [
+            "# HELP neuroevolution_phase_seconds_total Seconds spent in each training phase.",
+            "# TYPE neuroevolution_phase_seconds_total counter",
+        ]
+        lines += [f'neuroevolution_phase_seconds_total{{phase="{phase}"}} {population.timings[phase]}' for phase in PHASES]
+
+        memory = resident_memory()
+        if memory is not None:
+            lines += [
+                "# HELP process_resident_memory_bytes Resident memory size in bytes.",
+                "# TYPE process_resident_memory_bytes gauge",
+                f"process_resident_memory_bytes {memory}",
+            ]
+
+        return "\n".join(lines) + "\n"
+
+    def history(self):
+        population = self.population
+
+        return {
+            "generation": population.generation,
+            "best_fitness": json_value(population.best_fitness),
+            "history": [json_value(fitness) for fitness in list(population.history)],
+        }
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
\ No newline at end of file
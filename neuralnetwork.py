@@ -7,6 +7,13 @@ activation_functions = {
     "relu": (lambda x: _numpy.maximum(x, 0), lambda x: _numpy.where(x>0, 1, 0))
 }
 
+#the same activation functions applied in place for allocation free inference
+inplace_activation_functions = {
+    "tanh": lambda x: _numpy.tanh(x, x),
+    "sigmoid": lambda x: _numpy.divide(1, _numpy.add(1, _numpy.exp(_numpy.negative(x, x), x), x), x),
+    "relu": lambda x: _numpy.maximum(x, 0, x)
+}
+
 class Dense:
     """A class to represent a fully connected layer in a neural network."""
 
@@ -24,6 +31,8 @@ class Dense:
         self.biases = _numpy.random.randn(output_size, 1)
 
         self.activation, self.activation_derivative = activation_functions[activation.lower()]
+        self.inplace_activation = inplace_activation_functions[activation.lower()]
+        self.buffer = None
 
 
     def forward_pass(self, inputs: _numpy.ndarray) -> None:
@@ -42,23 +51,47 @@ class Dense:
         return self.outputs
 
 
+    def infer(self, inputs: _numpy.ndarray) -> _numpy.ndarray:
+        """
+        Performs forward propagation without keeping anything for backpropagation.
+
+        Args:
+            inputs (numpy.ndarray): the input to this layer.
+
+        Returns:
+            numpy.ndarray: the layer's output buffer, which is overwritten by the next call.
+        """
+
+        buffer = self.buffer
+
+        if buffer is None or buffer.shape[1] != inputs.shape[1] or len(buffer) != len(self.weights):
+            buffer = self.buffer = _numpy.empty((len(self.weights), inputs.shape[1]))
+
+        _numpy.dot(self.weights, inputs, buffer)
+        _numpy.add(buffer, self.biases, buffer)
+
+        return self.inplace_activation(buffer)
+
+
     def backward_pass(self, output_gradient: _numpy.ndarray, learning_rate: float) -> None:
         """
         Perform backward propagation.
 
         Args:
-            output_gradient (numpy.ndarray): The rate of change of the output with respect to its input.
+            output_gradient (numpy.ndarray): The rate of change of the output with respect to its input, one column per sample.
             learning_rate (float): The amount the model should change in response to the error.
 
         Returns:
             numpy.ndarray: The gradient of the error with respect to the input
         """
 
-        output_gradient *= self.activation_derivative(self.outputs)
+        output_gradient = output_gradient * self.activation_derivative(self.outputs)
+        input_gradient = _numpy.dot(self.weights.T, output_gradient)
+
         self.weights -= learning_rate * _numpy.dot(output_gradient, self.inputs.T)
-        self.biases -= learning_rate * output_gradient
+        self.biases -= learning_rate * output_gradient.sum(axis=1, keepdims=True)
 
-        return _numpy.dot(self.weights.T, output_gradient)
+        return input_gradient
 
 
 
@@ -77,17 +110,17 @@ class NeuralNetwork:
 
     def _mean_squared_error_derivative(self, correct, prediction) -> _numpy.ndarray:
         """
-        Computes the derivative of mean squared error.
+        Computes the derivative of mean squared error with respect to every output, averaged over the batch.
 
         Args:
             correct (numpy.ndarray): The correct output.
             prediction(numpy.ndarray): The predicted output.
 
         Returns:
-            float : The derivative of the mean squared error.
+            numpy.ndarray : The derivative of the mean squared error.
         """
 
-        return 2 * _numpy.mean(prediction - correct)
+        return 2 * (prediction - correct) / prediction.size
 
     def forward_propagation(self, inputs) -> _numpy.ndarray:
         """
@@ -107,6 +140,24 @@ class NeuralNetwork:
 
         return output
 
+    def predict(self, inputs) -> _numpy.ndarray:
+        """
+        Performs inference through the network using each layer's preallocated buffers.
+
+        Args:
+            inputs: The input data.
+
+        Returns:
+            numpy.ndarray: The output, identical to forward_propagation but only valid until the next call.
+        """
+
+        output = inputs
+
+        for layer in self.network:
+            output = layer.infer(output)
+
+        return output
+
     def _back_propagation(self, output, answer, learning_rate) -> _numpy.ndarray:
         """
         Backpropagates the error through the network.
@@ -123,24 +174,49 @@ class NeuralNetwork:
             gradient = layer.backward_pass(gradient, learning_rate)
 
 
-    def train(self, training_inputs, training_anwsers, epochs, *, learning_rate=0.1, display=False) -> None:
+    def _as_columns(self, samples) -> _numpy.ndarray:
+        """
+        Stacks a sequence of samples into a matrix with one column per sample.
+
+        Args:
+            samples: The samples, each a vector or column vector.
+
+        Returns:
+            numpy.ndarray: A (features, samples) matrix.
+        """
+
+        samples = _numpy.asarray(samples, dtype=float)
+        return samples.reshape(len(samples), -1).T
+
+    def train(self, training_inputs, training_anwsers, epochs, *, learning_rate=0.1, batch_size=32, shuffle=True, display=False) -> None:
         """
-        Trains the neural network using the specified inputs and answers.
+        Trains the neural network using the specified inputs and answers in mini-batches.
 
         Args:
-            training_inputs  (numpy.ndarray): The input data for training.
-            training_answers  (numpy.ndarray): The expected output data for training.
+            training_inputs  (numpy.ndarray): The input data for training, one sample per row.
+            training_answers  (numpy.ndarray): The expected output data for training, one sample per row.
             epochs (int): The number of training epochs.
             learning_rate (float, optional): The amount the model should change in response to the error.. Defaults to 0.1.
+            batch_size (int, optional): The number of samples per gradient step. Defaults to 32.
+            shuffle (bool, optional): Whether to shuffle the samples every epoch. Defaults to True.
             display (bool, optional): Whether to display progress. Defaults to False.
         """
 
+        inputs = self._as_columns(training_inputs)
+        answers = self._as_columns(training_anwsers)
+        samples = inputs.shape[1]
+
         for epoch in range(epochs):
+            if shuffle:
+                order = _numpy.random.permutation(samples)
+                epoch_inputs, epoch_answers = inputs[:, order], answers[:, order]
 
-            for inputs, answer in zip(training_inputs, training_anwsers):
+            else:
+                epoch_inputs, epoch_answers = inputs, answers
 
-                output = self.forward_propagation(inputs)
-                self._back_propagation(output, answer, learning_rate)
+            for start in range(0, samples, batch_size):
+                output = self.forward_propagation(epoch_inputs[:, start:start + batch_size])
+                self._back_propagation(output, epoch_answers[:, start:start + batch_size], learning_rate)
 
             if display:
                 print(f"{epoch + 1} / {epochs}")
@@ -180,6 +256,27 @@ class NeuroEvoloution(NeuralNetwork):
             layer.biases += self._mutate_layer(layer.biases, mutation_rate)
 
 
+    def randomize(self) -> None:
+        """Redraws the weights and biases in place from the distribution new layers start with."""
+
+        for layer in self.network:
+            layer.weights[...] = _numpy.random.randn(*layer.weights.shape)
+            layer.biases[...] = _numpy.random.randn(*layer.biases.shape)
+
+
+    def copy_from(self, other: NeuralNetwork) -> None:
+        """
+        Copies another network's weights and biases into this one's existing arrays.
+
+        Args:
+            other (NeuralNetwork): A network with the same layer sizes.
+        """
+
+        for layer, other_layer in zip(self.network, other.network):
+            layer.weights[...] = other_layer.weights
+            layer.biases[...] = other_layer.biases
+
+
     def crossover(self, parent: NeuralNetwork) -> None:
         """
         Performs a crossover operation with another neural network.
@@ -193,6 +290,38 @@ class NeuroEvoloution(NeuralNetwork):
             layer.biases = (layer.biases + parent_layer.biases) / 2
 
 
+    def get_parameters(self) -> _numpy.ndarray:
+        """
+        Flattens the weights and biases of every layer into one genome.
+
+        Returns:
+            numpy.ndarray: The parameters, layer by layer with the weights before the biases.
+        """
+
+        return _numpy.concatenate([
+            array.ravel() for layer in self.network for array in (layer.weights, layer.biases)
+        ])
+
+
+    def set_parameters(self, parameters: _numpy.ndarray) -> None:
+        """
+        Copies a flat genome from get_parameters into the layers' existing arrays.
+
+        Args:
+            parameters (numpy.ndarray): The flat parameters.
+        """
+
+        offset = 0
+
+        for layer in self.network:
+            for array in (layer.weights, layer.biases):
+                array[...] = _numpy.reshape(parameters[offset:offset + array.size], array.shape)
+                offset += array.size
+
+        if offset != len(parameters):
+            raise ValueError(f"expected {offset} parameters, got {len(parameters)}")
+
+
     def save(self, path: str) -> None:
         """
         Saves the neural network weights and biases to a .npz file.
@@ -223,4 +352,329 @@ class NeuroEvoloution(NeuralNetwork):
 
         for level, layer in enumerate(self.network):
             layer.weights = model[f'layer{level}_weights']
-            layer.biases = model[f'layer{level}_biases']
\ No newline at end of file
+            layer.biases = model[f'layer{level}_biases']
+
+class NeatNetwork:
+    """A NEAT style network whose connections and hidden nodes evolve along with its weights.
+
+    It starts with every input and a bias wired straight to the tanh outputs and grows by splitting
+    connections into hidden nodes and connecting unconnected nodes, never making a cycle. Inference runs a
+    compiled plan that visits only the enabled connections, one level of nodes at a time, so its cost
+    scales with the number of connections rather than the size of dense layers.
+    """
+
+    # innovation numbers and split nodes are shared by every network of the same shape, so networks that
+    # make the same structural mutation end up with the same genes and can be evaluated together
+    registries = {}
+
+    def __init__(self, input_size: int, output_size: int) -> None:
+        """
+        Initializes a minimal network with random weights.
+
+        Args:
+            input_size (int): The number of input nodes, a bias node is added after them.
+            output_size (int): The number of output nodes.
+        """
+
+        self.input_size = input_size
+        self.output_size = output_size
+        self.registry = self.registries.setdefault(
+            (input_size, output_size), {"innovations": {}, "nodes": {}, "next_node": input_size + 1 + output_size}
+        )
+
+        self.randomize()
+
+
+    def randomize(self) -> None:
+        """Resets the network to the minimal topology with new random weights."""
+
+        sources, targets = _numpy.meshgrid(
+            _numpy.arange(self.input_size + 1), self.input_size + 1 + _numpy.arange(self.output_size), indexing="ij"
+        )
+        self.sources = sources.ravel()
+        self.targets = targets.ravel()
+        self.weights = _numpy.random.randn(len(self.sources))
+        self.enabled = _numpy.ones(len(self.sources), dtype=bool)
+        self.innovations = _numpy.array([self._innovation(source, target) for source, target in zip(self.sources, self.targets)])
+
+        self.compile()
+
+
+    def _innovation(self, source: int, target: int) -> int:
+        innovations = self.registry["innovations"]
+        return innovations.setdefault((int(source), int(target)), len(innovations))
+
+
+    def compile(self) -> None:
+        """
+        Compiles the enabled connections into a topologically ordered evaluation plan.
+
+        Every node gets a level, the length of the longest path reaching it from an input, and connections are
+        sorted by the level and then the node they lead into. A level's nodes only read from earlier levels,
+        so each level is one gather, multiply and segmented sum over its connections.
+        """
+
+        self.node_count = max(self.input_size + 1 + self.output_size, int(self.targets.max()) + 1, int(self.sources.max()) + 1)
+        genes = _numpy.flatnonzero(self.enabled)
+        sources, targets = self.sources[genes], self.targets[genes]
+
+        depth = _numpy.zeros(self.node_count, dtype=int)
+
+        for _ in range(self.node_count):
+            deeper = depth.copy()
+            _numpy.maximum.at(deeper, targets, depth[sources] + 1)
+
+            if _numpy.array_equal(deeper, depth):
+                break
+
+            depth = deeper
+
+        order = _numpy.lexsort((targets, depth[targets]))
+        self.plan_genes = genes[order]
+        self.plan_sources = sources[order]
+        self.plan_weights = self.weights[self.plan_genes][:, _numpy.newaxis]
+
+        targets, levels = targets[order], depth[targets[order]]
+        self.plan = []
+
+        for level in _numpy.unique(levels):
+            start, stop = _numpy.searchsorted(levels, level), _numpy.searchsorted(levels, level, side="right")
+            level_targets, starts = _numpy.unique(targets[start:stop], return_index=True)
+            self.plan.append((start, stop, self.plan_sources[start:stop], level_targets, starts))
+
+        self.structure = self.node_count, self.innovations.tobytes(), self.enabled.tobytes()
+        self.values = None
+
+
+    def predict(self, inputs: _numpy.ndarray, weights: _numpy.ndarray = None) -> _numpy.ndarray:
+        """
+        Runs the compiled plan on a batch of inputs.
+
+        Args:
+            inputs (numpy.ndarray): An (inputs, batch) array.
+            weights (numpy.ndarray, optional): A (connections, batch) array of per column weights in gene order,
+                for evaluating several networks that share this structure at once. Defaults to None.
+
+        Returns:
+            numpy.ndarray: An (outputs, batch) view of an internal buffer, valid until the next call.
+        """
+
+        batch_size = inputs.shape[1]
+
+        if self.values is None or self.values.shape[1] != batch_size:
+            self.values = _numpy.zeros((self.node_count, batch_size))
+            self.values[self.input_size] = 1
+
+        values = self.values
+        values[:self.input_size] = inputs
+        plan_weights = self.plan_weights if weights is None else weights[self.plan_genes]
+
+        for start, stop, sources, targets, starts in self.plan:
+            contributions = values.take(sources, axis=0)
+            contributions *= plan_weights[start:stop]
+            sums = _numpy.add.reduceat(contributions, starts, axis=0)
+            values[targets] = _numpy.tanh(sums, out=sums)
+
+        return values[self.input_size + 1:self.input_size + 1 + self.output_size]
+
+
+    def _reaches(self, start: int, goal: int) -> bool:
+        genes = self.enabled
+        stack, seen = [start], {start}
+
+        while stack:
+            node = stack.pop()
+            if node == goal:
+                return True
+
+            for target in self.targets[genes & (self.sources == node)]:
+                if target not in seen:
+                    seen.add(target)
+                    stack.append(target)
+
+        return False
+
+
+    def _add_gene(self, source: int, target: int, weight: float) -> None:
+        existing = _numpy.flatnonzero((self.sources == source) & (self.targets == target))
+
+        if len(existing):
+            self.enabled[existing[0]] = True
+            self.weights[existing[0]] = weight
+            return
+
+        self.sources = _numpy.append(self.sources, source)
+        self.targets = _numpy.append(self.targets, target)
+        self.weights = _numpy.append(self.weights, weight)
+        self.enabled = _numpy.append(self.enabled, True)
+        self.innovations = _numpy.append(self.innovations, self._innovation(source, target))
+
+
+    def add_node(self) -> None:
+        """Splits a random enabled connection in two with a new hidden node, keeping its effect close to the original."""
+
+        gene = _numpy.random.choice(_numpy.flatnonzero(self.enabled))
+        source, target = int(self.sources[gene]), int(self.targets[gene])
+
+        node = self.registry["nodes"].get((source, target))
+
+        if node is None:
+            node = self.registry["nodes"][source, target] = self.registry["next_node"]
+            self.registry["next_node"] += 1
+
+        self.enabled[gene] = False
+        self._add_gene(source, node, 1.0)
+        self._add_gene(node, target, self.weights[gene])
+
+
+    def add_connection(self, attempts: int = 20) -> None:
+        """
+        Connects two unconnected nodes with a random weight, as long as that does not make a cycle.
+
+        Args:
+            attempts (int, optional): The number of random node pairs tried. Defaults to 20.
+        """
+
+        outputs = range(self.input_size + 1, self.input_size + 1 + self.output_size)
+        nodes = _numpy.union1d(self.sources, self.targets)
+        sources = nodes[(nodes < outputs.start) | (nodes >= outputs.stop)]
+        targets = nodes[nodes > self.input_size]
+
+        for _ in range(attempts):
+            source, target = int(_numpy.random.choice(sources)), int(_numpy.random.choice(targets))
+            connected = ((self.sources == source) & (self.targets == target) & self.enabled).any()
+
+            if source != target and not connected and not self._reaches(target, source):
+                self._add_gene(source, target, _numpy.random.randn())
+                return
+
+
+    def mutate(self, mutation_rate: float = 0.25, add_connection_rate: float = 0.2, add_node_rate: float = 0.05) -> None:
+        """
+        Perturbs every weight and sometimes grows the topology.
+
+        Args:
+            mutation_rate (float, optional): The most a weight is moved by, as in NeuroEvoloution.mutate. Defaults to 0.25.
+            add_connection_rate (float, optional): The chance of adding a connection. Defaults to 0.2.
+            add_node_rate (float, optional): The chance of splitting a connection with a node. Defaults to 0.05.
+        """
+
+        self.weights += (_numpy.random.rand(len(self.weights)) * 2 - 1) * mutation_rate
+        # growing can re-enable an old gene while disabling another, so the enabled set itself is compared
+        structure = len(self.weights), self.enabled.tobytes()
+
+        if _numpy.random.rand() < add_node_rate:
+            self.add_node()
+
+        if _numpy.random.rand() < add_connection_rate:
+            self.add_connection()
+
+        if (len(self.weights), self.enabled.tobytes()) == structure:
+            self.plan_weights[:, 0] = self.weights[self.plan_genes]
+
+        else:
+            self.compile()
+
+
+    def copy_from(self, other: "NeatNetwork") -> None:
+        """
+        Makes this network a copy of another, reusing the compiled plan when they already share a structure.
+
+        Args:
+            other (NeatNetwork): The network to copy.
+        """
+
+        if self.structure == other.structure:
+            self.weights[...] = other.weights
+            self.plan_weights[...] = other.plan_weights
+            return
+
+        self.sources, self.targets = other.sources.copy(), other.targets.copy()
+        self.weights, self.enabled = other.weights.copy(), other.enabled.copy()
+        self.innovations = other.innovations.copy()
+
+        self.node_count, self.structure = other.node_count, other.structure
+        self.plan_genes, self.plan_sources, self.plan = other.plan_genes, other.plan_sources, other.plan
+        self.plan_weights = other.plan_weights.copy()
+        self.values = None
+
+
+    def get_parameters(self) -> _numpy.ndarray:
+        """
+        Gets the weight of every connection gene, enabled or not.
+
+        Returns:
+            numpy.ndarray: The weights in gene order.
+        """
+
+        return self.weights.copy()
+
+
+    def set_parameters(self, parameters: _numpy.ndarray) -> None:
+        """
+        Copies weights from get_parameters of a network with the same genes into this one.
+
+        Args:
+            parameters (numpy.ndarray): The weights in gene order.
+        """
+
+        if len(parameters) != len(self.weights):
+            raise ValueError(f"expected {len(self.weights)} parameters, got {len(parameters)}")
+
+        self.weights[...] = parameters
+        self.plan_weights[:, 0] = self.weights[self.plan_genes]
+
+
+    def save(self, path: str) -> None:
+        """
+        Saves the genes to a .npz file.
+
+        Args:
+            path (str): The file path to save the genes to.
+        """
+
+        _numpy.savez(path, sources=self.sources, targets=self.targets, weights=self.weights, enabled=self.enabled)
+
+
+    def load(self, path: str) -> None:
+        """
+        Loads genes saved by save and compiles them.
+
+        Args:
+            path (str): The file path to load the genes from.
+        """
+
+        model = _numpy.load(path + ".npz")
+
+        self.sources, self.targets = model["sources"], model["targets"]
+        self.weights, self.enabled = model["weights"], model["enabled"]
+        self.innovations = _numpy.array([self._innovation(source, target) for source, target in zip(self.sources, self.targets)])
+
+        # the file's hidden nodes may not be in this process's registry, so new splits are numbered after them
+        self.compile()
+        self.registry["next_node"] = max(self.registry["next_node"], self.node_count)
+
+
+def predict_shared(networks, inputs: _numpy.ndarray) -> _numpy.ndarray:
+    """
+    Evaluates many NeatNetworks on one input column each, batching the ones with identical genes.
+
+    Args:
+        networks (list): The networks.
+        inputs (numpy.ndarray): An (inputs, networks) array, column i for network i.
+
+    Returns:
+        numpy.ndarray: An (outputs, networks) array.
+    """
+
+    groups = {}
+    for index, network in enumerate(networks):
+        groups.setdefault(network.structure, []).append(index)
+
+    outputs = _numpy.empty((networks[0].output_size, len(networks)))
+
+    for indices in groups.values():
+        weights = _numpy.stack([networks[index].weights for index in indices], axis=1)
+        outputs[:, indices] = networks[indices[0]].predict(inputs[:, indices], weights)
+
+    return outputs
\ No newline at end of file
@@ -1,53 +1,144 @@
 import math as _math
+import time as _time
+from concurrent.futures import ThreadPoolExecutor as _ThreadPoolExecutor
 
 import numpy as _numpy
 import pygame as _pygame
 
-from neuralnetwork import NeuroEvoloution, Dense
+from neuralnetwork import NeatNetwork, NeuroEvoloution, Dense
+from spritesheet import load_image
+from trajectory import TrajectoryBuffer
+
+
+ACTIONS = [
+    ["forward", "backward"],
+    ["left", "right", None]
+]
+
+
+STATIONARY_FRAMES = 75
+MAX_FRAMES = 3000
+
+# on tracks with a progress field, cars that stop gaining progress for this many frames or fall this far behind
+# their best are culled
+PROGRESS_WINDOW = 40
+BACKWARD_TOLERANCE = 30
+
+MUTATION_RATE = 0.3
+ARCHIVE_SIZE = 20
+
+# with a pipelined turnover, the next generation is bred in the background once this share of cars is left
+STRAGGLERS = 0.1
+
+# where training time goes: stepping cars locally, waiting on an evaluator and breeding the next cars
+PHASES = ("simulate", "evaluate", "turnover")
+
+
+def encode_directions(directions):
+    throttle = ACTIONS[0].index(directions[0]) if directions[0] in ACTIONS[0] else len(ACTIONS[0])
+    return throttle * len(ACTIONS[1]) + ACTIONS[1].index(directions[1])
 
 
 class Car:
-    def __init__(self, track, start_position, start_angle):
-        self.image = _pygame.image.load("assets/car.png").convert_alpha()
-        self.rotated_image = self.image
+    # cars hold no attributes beyond these, which keeps each one small in populations of thousands
+    __slots__ = (
+        "image", "rotated_image", "track", "starting_position", "starting_angle", "DIRECTIONS", "STEP_ANGLE",
+        "STATIONARY_FRAMES", "PROGRESS_WINDOW", "brain", "trajectory", "width", "height", "x", "y", "prev_x", "prev_y",
+        "angle", "velocity", "fitness", "num_frames", "progress", "progress_frames", "cache_key", "cached_fitness",
+        "genome_id", "sensor_cache", "DECISION_INTERVAL", "decision_phase", "action", "frame"
+    )
+
+    MAX_VELOCITY = 12
+    ACCELERATION = 0.3
+    FRICTION = 0.2
+    MAX_DEPTH = 500
+
+    def __init__(self, track, start_position, start_angle, directions=32, hidden_layers=(24, 16, 12, 8),
+                 stationary_frames=STATIONARY_FRAMES, progress_window=PROGRESS_WINDOW, evolve_topology=False,
+                 sensor_cache=None, decision_interval=1, record_trajectory=False):
+        self.image = load_image("assets/car.png").copy()
         self.track = track
+        self.starting_position = start_position
+        self.starting_angle = start_angle
+
+        self.DIRECTIONS = directions
+        self.STEP_ANGLE = 360 / self.DIRECTIONS * _math.pi / 180
+
+        self.STATIONARY_FRAMES = stationary_frames
+        self.PROGRESS_WINDOW = progress_window
+        self.sensor_cache = sensor_cache
+
+        # the sensors and brain only run every DECISION_INTERVAL frames, on frames matching the phase
+        self.DECISION_INTERVAL = decision_interval
+        self.decision_phase = 0
+
+        if evolve_topology:
+            self.brain = NeatNetwork(self.DIRECTIONS, 5)
 
+        else:
+            sizes = [self.DIRECTIONS, *hidden_layers, 5]
+            self.brain = NeuroEvoloution(
+                *[Dense(input_size, output_size, "tanh") for input_size, output_size in zip(sizes, sizes[1:])]
+            )
+
+        # every frame of every car would be kept, so drives are only recorded when something replays them
+        self.trajectory = TrajectoryBuffer() if record_trajectory else None
+        self.reset()
+
+    def reset(self):
+        # puts the car back on the start line, keeping its image, brain and buffers so it can be reused for a new genome
+        self.rotated_image = self.image
         self.width, self.height = self.rotated_image.get_size()
-        self.starting_position = start_position
         self.x, self.y = self.starting_position
-        self.angle = start_angle
+        self.angle = self.starting_angle
         self.velocity = 0
 
-        self.MAX_VELOCITY = 12
-        self.ACCELERATION = 0.3
-        self.FRICTION = 0.2
-
-        self.DIRECTIONS = 32
-        self.STEP_ANGLE = 360 / self.DIRECTIONS * _math.pi / 180
-        self.MAX_DEPTH = 500
-
-        self.brain = NeuroEvoloution(
-            Dense(self.DIRECTIONS, 24, "tanh"),
-            Dense(24, 16, "tanh"),
-            Dense(16, 12, "tanh"),
-            Dense(12, 8, "tanh"),
-            Dense(8, 5, "tanh"),
-        )
-
         self.fitness = 0
         self.num_frames = 0
+        self.progress = 0
+        self.progress_frames = 0
+        self.frame = 0
+        if self.trajectory is not None:
+            self.trajectory.clear()
+
+        self.cache_key = None
+        self.cached_fitness = None
+        self.genome_id = None
+        self.action = None
 
     @property
     def has_collided(self):
         car_mask = _pygame.mask.from_surface(self.rotated_image)
-        return car_mask.overlap(self.track.mask, (-self.x, -self.y)) or self.x < 0 or self.x > self.track.WIDTH or self.y < 0 or self.y > self.track.HEIGHT
+        return self.track.collides(car_mask, self.x, self.y) or self.x < 0 or self.x > self.track.WIDTH or self.y < 0 or self.y > self.track.HEIGHT
 
     @property
     def in_bounds(self):
-        return 0 < self.x < self.track.WIDTH and 150 < self.y < self.track.HEIGHT
+        return 0 < self.x < self.track.WIDTH and self.track.TOP < self.y < self.track.HEIGHT
 
     def update_fitness(self):
-        self.fitness += _math.sqrt((self.prev_x - self.x) ** 2 + (self.prev_y - self.y) ** 2)
+        if self.track.progress is None:
+            self.fitness += _math.sqrt((self.prev_x - self.x) ** 2 + (self.prev_y - self.y) ** 2)
+            return
+
+        self.progress = self.track.progress_at((self.x + self.width / 2, self.y + self.height / 2))
+
+        if self.progress > self.fitness:
+            self.fitness = self.progress
+            self.progress_frames = 0
+
+        else:
+            self.progress_frames += 1
+
+    @property
+    def culled(self):
+        if self.track.progress is None:
+            return self.num_frames > self.STATIONARY_FRAMES
+
+        return self.progress_frames > self.PROGRESS_WINDOW or self.progress < self.fitness - BACKWARD_TOLERANCE
+
+    @property
+    def finished(self):
+        return self.has_collided or not self.in_bounds or self.culled
 
     def get_stationary_frames(self):
         return int(not (abs(self.prev_x - self.x) > 2))
@@ -58,12 +149,18 @@ class Car:
 
 
     def get_state(self):
-        inputs = _numpy.zeros(self.DIRECTIONS)
-        start_angle = self.angle
-
         center_x = self.x + self.width // 2
         center_y = self.y + self.height // 2
 
+        if self.sensor_cache is not None:
+            return self.sensor_cache.get(self, center_x, center_y, self.angle)
+
+        return self.sense(center_x, center_y, self.angle)
+
+
+    def sense(self, center_x, center_y, start_angle):
+        inputs = _numpy.zeros(self.DIRECTIONS)
+
         for direction in range(self.DIRECTIONS):
             angle_x = _math.sin(start_angle)
             angle_y = _math.cos(start_angle)
@@ -73,7 +170,7 @@ class Car:
                 target_y = center_y + angle_y * depth
 
                 try:
-                    if self.track.mask.get_at((target_x, target_y)):
+                    if self.track.get_at((target_x, target_y)):
                         inputs[direction] = 1 - depth / self.MAX_DEPTH
                         break
 
@@ -86,21 +183,25 @@ class Car:
         return _numpy.reshape(inputs, (self.DIRECTIONS, 1))
 
 
-    def ai_move(self):
-        actions = [
-            ["forward", "backward"],
-            ["left", "right", None]
-        ]
+    def ai_move(self, inputs=None):
+        if inputs is None:
+            inputs = self.get_state()
 
-        inputs = self.get_state()
-        outputs = self.convert(self.brain.forward_propagation(inputs))
+        outputs = self.convert(self.brain.predict(inputs))
 
         return [
-            actions[0][outputs[0].argmax()],
-            actions[1][outputs[1].argmax()]  
+            ACTIONS[0][outputs[0].argmax()],
+            ACTIONS[1][outputs[1].argmax()]
         ]
 
 
+    def keyboard_move(self, keys):
+        throttle = "forward" if keys[_pygame.K_UP] else "backward" if keys[_pygame.K_DOWN] else None
+        steering = "left" if keys[_pygame.K_LEFT] else "right" if keys[_pygame.K_RIGHT] else None
+
+        return [throttle, steering]
+
+
     def change_angle(self, direction, dt):
         delta_angle = (self.velocity / 100) * dt
 
@@ -135,60 +236,317 @@ class Car:
         self.y += _math.cos(self.angle) * self.velocity * dt
 
 
-    def draw(self,surface):
+    def rotate(self):
         angle = self.angle * 180 / _math.pi
         self.rotated_image = _pygame.transform.rotate(self.image, angle)
+
+
+    def draw(self,surface):
         surface.blit(self.rotated_image, (self.x, self.y))
 
 
-    def update(self, surface, dt):
+    def update(self, surface, dt, directions=None):
         self.width, self.height = self.rotated_image.get_size()
+
+        if not directions:
+            # between decisions the last action is held
+            if self.action is None or self.frame % self.DECISION_INTERVAL == self.decision_phase:
+                self.action = self.ai_move()
+
+            directions = self.action
+
         self.move(
-            self.ai_move(), dt
+            directions, dt
         )
-        self.draw(surface)
+
+        if self.trajectory is not None:
+            self.trajectory.append(self.x, self.y, self.angle, self.velocity, encode_directions(directions))
+
+        self.rotate()
+
+        if surface is not None:
+            self.draw(surface)
+
         self.update_fitness()
         self.num_frames += self.get_stationary_frames()
+        self.frame += 1
 
 
 
 class Population:
-    def __init__(self, population_size, track, start_position, start_angle=3*_math.pi/2):
+    def __init__(self, population_size, track, start_position, start_angle=3*_math.pi/2, fitness_cache=None, steady_state=False,
+                 mutation_rate=MUTATION_RATE, model_path="models/model", car_options=None, lineage=None, pipeline=False,
+                 stagger_decisions=False):
         self.population_size = population_size
         self.car_data = track, start_position, start_angle
+        self.car_options = car_options or {}
+        self.fitness_cache = fitness_cache
+
+        if self.car_options.get("evolve_topology") and (steady_state or lineage is not None):
+            raise ValueError("evolved topologies vary in size, so they only support generational training")
+
+        if pipeline and (steady_state or lineage is not None or self.car_options.get("evolve_topology")):
+            raise ValueError("a pipelined turnover needs generational training of fixed size genomes without a lineage")
+
+        measure_progress(*self.car_data)
+
+        self.mutation_rate = mutation_rate
+        # without a model path the champion is only kept in memory, so several runs can share a directory
+        self.model_path = model_path
+
+        # in steady state mode a dead car is replaced straight away by a child of the elite archive and a
+        # generation is just a count of population_size evaluations
+        self.steady_state = steady_state
+        self.archive = []
+        self.pending = {}
+
+        # running totals for monitoring
+        self.evaluations = 0
+        self.steps = 0
+        self.timings = dict.fromkeys(PHASES, 0.0)
+
+        # with a lineage, children are recorded as their parent's id and a noise seed rather than their parameters
+        self.lineage = lineage
+
+        # generations reuse these cars, the spare stands in for whichever one becomes champion and is kept as is
+        self.pool = [Car(*self.car_data, **self.car_options) for _ in range(self.population_size)]
+        self.spare = Car(*self.car_data, **self.car_options)
+
+        self.cars = self.pool[:]
+        self.register_roots(self.cars)
+
+        # a pipelined population breeds the next generation into a second pool while stragglers finish, so the
+        # turnover itself is only a swap of the two
+        self.pipeline = pipeline
+        self.standby = [Car(*self.car_data, **self.car_options) for _ in range(self.population_size)] if pipeline else None
+        self.executor = _ThreadPoolExecutor(max_workers=1) if pipeline else None
+        self.seed = _numpy.random.randint(2 ** 32, dtype=_numpy.uint32) if pipeline else None
+        self.preparation = None
+        self.prepared_for = None
 
-        self.cars = [Car(*self.car_data) for _ in range(self.population_size)]
+        self.stagger_decisions = stagger_decisions
 
         self.generation = 1
         self.best_fitness = -float('inf')
         self.best_current_fitness = -float('inf')
         self.history = []
+        self.champion = None
+
+        self.assign_phases()
+        self.lookup_fitnesses()
 
 
     def load_cars(self):
+        if self.lineage is not None and self.champion is not None:
+            self.inherit_cars()
+            return
+
+        if self.champion is None:
+            self.cars[0].brain.load(self.model_path)
+            parent = self.cars[0].brain
+
+        else:
+            parent = self.champion.brain
+
         for car_index, car in enumerate(self.cars):
-            car.brain.load("models/model")
+            car.brain.copy_from(parent)
+
             if car_index != 0:
-                car.brain.mutate(0.3)
+                car.brain.mutate(self.mutation_rate)
+
+        self.register_roots(self.cars)
+
+
+    def inherit_cars(self):
+        parent_id = self.champion.genome_id
+
+        for car_index, car in enumerate(self.cars):
+            car.genome_id = parent_id if car_index == 0 else self.lineage.add_child(parent_id, self.mutation_rate)
+            car.brain.set_parameters(self.lineage.parameters(car.genome_id))
+
+
+    def register_roots(self, cars):
+        if self.lineage is None:
+            return
+
+        for car in cars:
+            car.genome_id = self.lineage.add_root(car.brain.get_parameters())
+
+
+    def prepare_offspring(self):
+        # the champion's genome is copied now, the breeding itself happens on the executor's thread
+        self.prepared_for = self.champion
+        self.preparation = self.executor.submit(
+            self.breed_generation, self.standby, self.champion.brain.get_parameters(), self.generation
+        )
+
+
+    def breed_generation(self, cars, parameters, generation):
+        # all the mutation noise of a generation is drawn at once from a generator seeded by the generation, so
+        # the main thread's random state is left alone and a restarted breeding draws the same noise
+        rng = _numpy.random.default_rng((self.seed, generation))
+        children = rng.random((len(cars) - 2, len(parameters)))
+        children *= 2 * self.mutation_rate
+        children += parameters - self.mutation_rate
+
+        for car in cars:
+            car.reset()
+
+        cars[0].brain.set_parameters(parameters)
+
+        for car, child in zip(cars[1:-1], children):
+            car.brain.set_parameters(child)
+
+        cars[-1].brain.set_parameters(rng.standard_normal(len(parameters)))
+
+
+    def swap_pools(self):
+        # a straggler that took the lead after breeding started makes that breeding stale
+        if self.prepared_for is not self.champion:
+            self.prepare_offspring()
+
+        self.preparation.result()
+        self.pool, self.standby = self.standby, self.pool
+        self.cars = self.pool[:]
+        self.preparation = self.prepared_for = None
+
+        # the champion stays as it is and the spare breeds in its place from now on
+        for car_index, car in enumerate(self.standby):
+            if car is self.champion:
+                self.standby[car_index], self.spare = self.spare, car
+
+        self.assign_phases()
+        self.lookup_fitnesses()
+
+
+    def assign_phases(self):
+        # spreading the cars' decision frames over the interval evens out the work per frame
+        if not self.stagger_decisions:
+            return
+
+        for car_index, car in enumerate(self.cars):
+            car.decision_phase = car_index % car.DECISION_INTERVAL
+
+        # slot 0 carries the unmutated champion after a turnover, it keeps the phase its fitness was earned with so a
+        # genome always drives, and is cached, with one phase
+        if self.champion is not None:
+            self.cars[0].decision_phase = self.champion.decision_phase
 
 
     def mutate_cars(self):
+        start = _time.perf_counter()
+
+        if self.pipeline and self.champion is not None:
+            self.swap_pools()
+            self.generation += 1
+            self.best_current_fitness = -float('inf')
+            self.timings["turnover"] += _time.perf_counter() - start
+            return
+
         self.generation += 1
-        self.cars = [Car(*self.car_data) for _ in range(self.population_size-1)]
         self.best_current_fitness = -float('inf')
 
+        for car_index, car in enumerate(self.pool):
+            if car is self.champion:
+                self.pool[car_index], self.spare = self.spare, car
+
+        for car in self.pool:
+            car.reset()
+
+        self.cars = self.pool[:-1]
         self.load_cars()
-        self.cars.append(Car(*self.car_data))
+
+        self.cars.append(self.pool[-1])
+        self.cars[-1].brain.randomize()
+        self.register_roots(self.cars[-1:])
+        self.assign_phases()
+        self.lookup_fitnesses()
+        self.prune_lineage()
+        self.timings["turnover"] += _time.perf_counter() - start
+
+
+    def prune_lineage(self):
+        if self.lineage is None:
+            return
+
+        alive = [car.genome_id for car in self.cars] + [car.genome_id for batch in self.pending.values() for car in batch]
+        alive += [entry[2] for entry in self.archive]
+
+        if self.champion is not None:
+            alive.append(self.champion.genome_id)
+
+        self.lineage.prune(alive)
+
+
+    def lookup_fitnesses(self, cars=None):
+        if self.fitness_cache is None:
+            return
+
+        for car in self.cars if cars is None else cars:
+            # a staggered car's fitness depends on the frames it decides on, not just its parameters
+            phase = (car.decision_phase,) if self.stagger_decisions else ()
+            car.cache_key = self.fitness_cache.key(car.brain.get_parameters(), *phase)
+            car.cached_fitness = self.fitness_cache.get(car.cache_key)
+
+
+    def breed(self, car=None):
+        if car is None or car is self.champion:
+            car = Car(*self.car_data, **self.car_options)
+
+        else:
+            car.reset()
+
+        parents = self.archive or [(None, parent.brain.get_parameters(), parent.genome_id) for parent in self.cars]
+        _, parameters, genome_id = parents[_numpy.random.randint(len(parents))]
+
+        if genome_id is None:
+            car.brain.set_parameters(parameters)
+            car.brain.mutate(self.mutation_rate)
+
+        else:
+            car.genome_id = self.lineage.add_child(genome_id, self.mutation_rate)
+            car.brain.set_parameters(self.lineage.parameters(car.genome_id))
+
+        self.lookup_fitnesses([car])
+
+        return car
+
+
+    def record(self, parameters, fitness, genome_id=None):
+        self.archive.append((fitness, parameters, genome_id))
+        self.archive.sort(key=lambda entry: entry[0], reverse=True)
+        del self.archive[ARCHIVE_SIZE:]
+
+        self.evaluations += 1
+
+        if self.evaluations % self.population_size == 0:
+            self.generation += 1
+            self.history.append(self.best_current_fitness)
+            self.best_current_fitness = -float('inf')
+            self.prune_lineage()
 
 
     def update_best_genotype(self, car):
         self.best_fitness = car.fitness
-        car.brain.save("models/model")
+        self.champion = car
+        if self.model_path is not None:
+            car.brain.save(self.model_path)
 
 
     def train(self, surface, dt):
-        for car in self.cars:
-            car.update(surface, dt)
+        # cached fitnesses are only valid for the fixed dt of headless training, and drawing needs the car simulated anyway
+        headless = surface is None
+        start = _time.perf_counter()
+
+        for car in self.cars[:]:
+            cached = headless and car.cached_fitness is not None
+
+            if cached:
+                car.fitness = car.cached_fitness
+
+            else:
+                car.update(surface, dt)
+                self.steps += 1
 
             if car.fitness > self.best_current_fitness:
                 self.best_current_fitness = car.fitness
@@ -200,10 +558,164 @@ class Population:
             else:
                 car.image.set_alpha(50)
 
-            if car.has_collided or not car.in_bounds or car.num_frames > 75:
+            if cached or car.finished:
                 self.cars.remove(car)
 
+                if car is self.champion and not cached and self.model_path is not None and car.trajectory is not None:
+                    car.trajectory.save(self.model_path + "_trajectory")
+
+                if headless and not cached and car.cache_key is not None:
+                    self.fitness_cache.put(car.cache_key, car.fitness)
+
+                # breeding may reuse the finished car, so it comes after everything that reads its drive
+                if self.steady_state:
+                    self.record(car.brain.get_parameters(), car.fitness, car.genome_id)
+                    self.cars.append(self.breed(car))
+
+                else:
+                    self.evaluations += 1
+
+        self.timings["simulate"] += _time.perf_counter() - start
+
+        if (self.pipeline and self.champion is not self.prepared_for and len(self.cars) <= self.population_size * STRAGGLERS
+                and (self.preparation is None or self.preparation.done())):
+            self.prepare_offspring()
 
         if not self.cars:
             self.history.append(self.best_current_fitness)
             self.mutate_cars()
+
+
+    def evaluate_generation(self, evaluate, encoded=False):
+        start = _time.perf_counter()
+
+        fitnesses = self.evaluate_uncached(evaluate, encoded)
+
+        self.timings["evaluate"] += _time.perf_counter() - start
+        self.evaluations += len(self.cars)
+
+        for car, fitness in zip(self.cars, fitnesses):
+            car.fitness = fitness
+
+        best = self.cars[int(_numpy.argmax(fitnesses))]
+        self.best_current_fitness = best.fitness
+
+        if best.fitness > self.best_fitness:
+            self.update_best_genotype(best)
+
+        self.history.append(self.best_current_fitness)
+        self.mutate_cars()
+
+
+    def evaluate_uncached(self, evaluate, encoded=False):
+        # cars were looked up in the fitness cache when they were bred, so only the misses reach the evaluator, as a
+        # (genomes, parameters) array or, when encoded, as genome ids to look up in the lineage
+        fitnesses = _numpy.array([_numpy.nan if car.cached_fitness is None else car.cached_fitness for car in self.cars])
+        missing = _numpy.flatnonzero(_numpy.isnan(fitnesses))
+
+        if len(missing) and encoded:
+            fitnesses[missing] = evaluate([self.cars[index].genome_id for index in missing])
+
+        elif len(missing):
+            fitnesses[missing] = evaluate(_numpy.stack([self.cars[index].brain.get_parameters() for index in missing]))
+
+        for index in missing:
+            if self.cars[index].cache_key is not None:
+                self.fitness_cache.put(self.cars[index].cache_key, fitnesses[index])
+
+        return fitnesses
+
+
+    def evaluate_steady_state(self, submit, collect, evaluations, batch_size=32, in_flight=4):
+        """
+        Evaluates children as fast as the evaluator returns them instead of one generation at a time.
+
+        Up to in_flight batches are out at once and each returned batch is replaced by a freshly bred one,
+        so no worker waits for the slowest batch of a generation.
+
+        Args:
+            submit (callable): Sends an id and a (genomes, parameters) array off for evaluation.
+            collect (callable): Blocks until a batch is done and returns its id and fitnesses.
+            evaluations (int): The number of genomes to evaluate.
+            batch_size (int, optional): The number of genomes per batch. Defaults to 32.
+            in_flight (int, optional): The number of batches being evaluated at once. Defaults to 4.
+        """
+
+        batch_id = 0
+        submitted = 0
+
+        while self.pending or submitted < evaluations:
+            while len(self.pending) < in_flight and submitted < evaluations:
+                batch = []
+
+                while len(batch) < batch_size and submitted < evaluations:
+                    car = self.cars.pop() if self.cars else self.breed()
+                    submitted += 1
+
+                    if car.cached_fitness is not None:
+                        self.record_evaluation(car.brain.get_parameters(), car.cached_fitness, car.genome_id)
+
+                    else:
+                        batch.append(car)
+
+                if batch:
+                    self.pending[batch_id] = batch
+                    submit(batch_id, _numpy.stack([car.brain.get_parameters() for car in batch]))
+                    batch_id += 1
+
+            if self.pending:
+                start = _time.perf_counter()
+                finished_id, fitnesses = collect()
+                self.timings["evaluate"] += _time.perf_counter() - start
+
+                # the batch stays pending until all of it is recorded, so pruning the lineage keeps its genomes
+                for car, fitness in zip(self.pending[finished_id], fitnesses):
+                    if car.cache_key is not None:
+                        self.fitness_cache.put(car.cache_key, fitness)
+
+                    self.record_evaluation(car.brain.get_parameters(), fitness, car.genome_id)
+
+                del self.pending[finished_id]
+
+
+    def record_evaluation(self, parameters, fitness, genome_id=None):
+        if fitness > self.best_current_fitness:
+            self.best_current_fitness = fitness
+
+        if fitness > self.best_fitness:
+            champion = Car(*self.car_data, **self.car_options)
+            champion.brain.set_parameters(parameters)
+            champion.fitness = fitness
+            champion.genome_id = genome_id
+            self.update_best_genotype(champion)
+
+        self.record(parameters, fitness, genome_id)
+
+
+
+def measure_progress(track, start_position, start_angle):
+    width, height = load_image("assets/car.png").get_size()
+    track.measure_progress((start_position[0] + width / 2, start_position[1] + height / 2), start_angle)
+
+
+def evaluate(track, start_position, start_angle, genomes, max_frames=MAX_FRAMES):
+    measure_progress(track, start_position, start_angle)
+    cars = [Car(track, start_position, start_angle) for _ in genomes]
+    fitnesses = _numpy.zeros(len(cars))
+
+    for car, genome in zip(cars, genomes):
+        car.brain.set_parameters(genome)
+
+    alive = list(enumerate(cars))
+
+    for _ in range(max_frames):
+        if not alive:
+            break
+
+        for index, car in alive:
+            car.update(None, 1)
+            fitnesses[index] = car.fitness
+
+        alive = [(index, car) for index, car in alive if not car.finished]
+
+    return fitnesses
\ No newline at end of file
@@ -0,0 +1,407 @@
+import argparse as _argparse
+import io as _io
+import math as _math
+import os as _os
+import queue as _queue
+import subprocess as _subprocess
+import sys as _sys
+import tempfile as _tempfile
+import threading as _threading
+import time as _time
+import zipfile as _zipfile
+from multiprocessing import resource_tracker as _resource_tracker
+from multiprocessing import shared_memory as _shared_memory
+
+import numpy as _numpy
+import pygame as _pygame
+
+from enviroment import Track
+from gui import Graph
+from spritesheet import load_image
+
+
+STATS = ["generation", "alive", "population_size", "best_fitness", "best_current_fitness", "history_length", "steps_per_second"]
+
+
+class SharedState:
+    """A double-buffered shared memory block of car poses and training stats.
+
+    The control block holds the index of the latest complete slot and a stop flag. Each slot holds a
+    sequence number that is odd while the slot is being written, so a reader can tell a torn copy apart
+    from a complete one and simply skip it.
+    """
+
+    def __init__(self, capacity: int, history_capacity: int = 1024, name: str = None) -> None:
+        """
+        Creates the shared block, or attaches to an existing one when a name is given.
+
+        Args:
+            capacity (int): The maximum number of cars per snapshot.
+            history_capacity (int, optional): The number of past generation fitnesses kept. Defaults to 1024.
+            name (str, optional): The name of an existing block to attach to. Defaults to None.
+        """
+
+        self.capacity = capacity
+        self.history_capacity = history_capacity
+
+        slot_size = 8 + 8 * len(STATS) + 16 * capacity + 8 * history_capacity
+        size = 16 + 2 * slot_size
+
+        if name is None:
+            self.memory = _shared_memory.SharedMemory(create=True, size=size)
+
+        else:
+            self.memory = _shared_memory.SharedMemory(name=name)
+            # the creating process owns the block, without this the attaching process would unlink it on exit
+            _resource_tracker.unregister(self.memory._name, "shared_memory")
+
+        self.name = self.memory.name
+        self.control = _numpy.ndarray(2, dtype=_numpy.int64, buffer=self.memory.buf)
+        self.slots = []
+
+        for slot in range(2):
+            offset = 16 + slot * slot_size
+            sequence = _numpy.ndarray(1, dtype=_numpy.int64, buffer=self.memory.buf, offset=offset)
+            stats = _numpy.ndarray(len(STATS), dtype=_numpy.float64, buffer=self.memory.buf, offset=offset + 8)
+            offset += 8 + 8 * len(STATS)
+            cars = _numpy.ndarray((capacity, 4), dtype=_numpy.float32, buffer=self.memory.buf, offset=offset)
+            offset += 16 * capacity
+            history = _numpy.ndarray(history_capacity, dtype=_numpy.float64, buffer=self.memory.buf, offset=offset)
+
+            self.slots.append((sequence, stats, cars, history))
+
+        self.published = 0
+
+    @property
+    def stopped(self) -> bool:
+        return bool(self.control[1])
+
+    def stop(self) -> None:
+        self.control[1] = 1
+
+    def publish(self, population, steps_per_second: float = 0) -> None:
+        """
+        Writes a snapshot of the population into the slot the reader is not using and makes it the latest.
+
+        Args:
+            population (Population): The population to publish.
+            steps_per_second (float, optional): The simulation speed to report. Defaults to 0.
+        """
+
+        slot = (self.control[0] + 1) % 2
+        sequence, stats, cars, history = self.slots[slot]
+        sequence[0] += 1
+
+        alive = population.cars[:self.capacity]
+        for index, car in enumerate(alive):
+            cars[index] = car.x, car.y, car.angle, car.image.get_alpha() == 255
+
+        recent = population.history[-self.history_capacity:]
+        history[:len(recent)] = recent
+        stats[:] = (
+            population.generation, len(alive), population.population_size, population.best_fitness,
+            population.best_current_fitness, len(recent), steps_per_second
+        )
+
+        sequence[0] += 1
+        self.control[0] = slot
+        self.published += 1
+
+    def read(self):
+        """
+        Copies the latest complete snapshot.
+
+        Returns:
+            tuple: A dict of stats, a (cars, 4) array of x, y, angle and highlight and a list of fitnesses,
+            or None if the snapshot was overwritten while it was being copied.
+        """
+
+        sequence, stats, cars, history = self.slots[self.control[0]]
+        before = sequence[0]
+        stats = dict(zip(STATS, stats.tolist()))
+        cars = cars[:int(stats["alive"])].copy()
+        history = history[:int(stats["history_length"])].tolist()
+
+        if before % 2 or sequence[0] != before:
+            return None
+
+        return stats, cars, history
+
+    def close(self, unlink: bool = False) -> None:
+        del self.control, self.slots
+        self.memory.close()
+
+        if unlink:
+            self.memory.unlink()
+
+
+def draw_stats(surface, font, stats, history, graph_size=151) -> None:
+    """
+    Draws the training HUD and the fitness graph.
+
+    Args:
+        surface (pygame.Surface): The surface to draw on.
+        font (pygame.font.Font): The HUD font.
+        stats (dict): The generation, alive, population_size, best_fitness and best_current_fitness to show.
+        history (list): The best fitness of every finished generation.
+        graph_size (int, optional): The width and height of the graph. Defaults to 151.
+    """
+
+    increment = max((graph_size - 1) // int(stats["generation"]), 1)
+    graph = Graph(graph_size, increment)
+    points = [0] + history
+
+    if len(points) > 1:
+        graph.plot_y([point * (graph.size / max(history)) for point in points])
+
+    data = [
+        font.render(f"generation: {int(stats['generation'])} ", True, (255, 255, 255)),
+        font.render(f"population: {int(stats['alive'])}/{int(stats['population_size'])}", True, (255, 255, 255)),
+        font.render(f"best fitness: {round(stats['best_fitness'], 2)}", True, (255, 255, 255)),
+        font.render(f"best current fitness: {round(stats['best_current_fitness'], 2)} ", True, (255, 255, 255)),
+    ]
+
+    for i, datum in enumerate(data):
+        surface.blit(datum, (10, i * 35))
+
+    graph.draw(surface, surface.get_width() - graph.size, 0)
+
+
+class FrameWriter:
+    """Draws sampled generations offscreen on a background thread and writes them out as numbered PNGs.
+
+    Every `every`th generation is captured live, one frame per `stride` simulation steps, and each new
+    champion's recorded trajectory is drawn once its generation ends. Captures wait in a bounded queue and are
+    dropped when it is full, so a slow disk or encoder never holds training up.
+    """
+
+    def __init__(self, track, output: str, every: int = 10, champions: bool = True, stride: int = 1,
+                 queue_size: int = 64) -> None:
+        """
+        Starts the writer thread.
+
+        Args:
+            track (Track): The track to draw the cars on.
+            output (str): A directory for the PNGs, or a path ending in .zip to store them in one archive.
+            every (int, optional): Capture every nth generation, 0 for none. Defaults to 10.
+            champions (bool, optional): Whether to draw the trajectory of each new champion, which needs cars built
+                with record_trajectory. Defaults to True.
+            stride (int, optional): The number of simulation steps per captured frame. Defaults to 1.
+            queue_size (int, optional): The number of frames that can wait to be drawn. Defaults to 64.
+        """
+
+        self.every = every
+        self.champions = champions
+        self.stride = stride
+
+        self.background = _pygame.Surface(track.image.get_size())
+        self.background.fill((255, 255, 255))
+        self.background.blit(track.image, (0, 0))
+
+        if output.endswith(".zip"):
+            # the frames are PNGs and already compressed, so they are stored as they are
+            self.archive = _zipfile.ZipFile(output, "w", _zipfile.ZIP_STORED)
+            self.directory = None
+
+        else:
+            self.archive = None
+            self.directory = output
+            _os.makedirs(output, exist_ok=True)
+
+        self.queue = _queue.Queue(queue_size)
+        self.generation = None
+        self.best_fitness = -float("inf")
+        self.step = 0
+        self.written = 0
+        self.dropped = 0
+
+        self.thread = _threading.Thread(target=self.work, daemon=True)
+        self.thread.start()
+
+    def submit(self, directory: str, frames: list) -> None:
+        try:
+            self.queue.put_nowait((directory, frames))
+
+        except _queue.Full:
+            self.dropped += 1
+
+    def capture(self, population) -> None:
+        """
+        Queues the frames due after a training step.
+
+        Args:
+            population (Population): The population that was just stepped.
+        """
+
+        if population.generation != self.generation:
+            if self.champions and self.generation is not None and population.best_fitness > self.best_fitness:
+                self.capture_champion(population.champion)
+
+            self.generation = population.generation
+            self.best_fitness = population.best_fitness
+            self.step = 0
+
+        if self.every and self.generation % self.every == 0 and self.step % self.stride == 0:
+            cars = _numpy.array([
+                (car.x, car.y, car.angle, car.image.get_alpha() == 255) for car in population.cars
+            ], dtype=_numpy.float32).reshape(-1, 4)
+            self.submit(f"generation_{self.generation:05d}", [(self.step // self.stride, cars)])
+
+        self.step += 1
+
+    def capture_champion(self, champion) -> None:
+        if champion.trajectory is None:
+            return
+
+        # the whole drive is one queue entry, copied now because the champion's car is reused later on
+        poses = champion.trajectory.poses[::self.stride, :3]
+        highlight = _numpy.ones((len(poses), 1), dtype=_numpy.float32)
+        cars = _numpy.hstack([poses, highlight])[:, _numpy.newaxis]
+
+        if len(cars):
+            self.submit(f"champion_{self.generation:05d}", list(enumerate(cars)))
+
+    def work(self) -> None:
+        surface = self.background.copy()
+        car_image = load_image("assets/car.png").copy()
+
+        while True:
+            item = self.queue.get()
+
+            if item is None:
+                break
+
+            directory, frames = item
+
+            for frame, cars in frames:
+                surface.blit(self.background, (0, 0))
+
+                for x, y, angle, highlight in cars:
+                    car_image.set_alpha(255 if highlight else 50)
+                    surface.blit(_pygame.transform.rotate(car_image, angle * 180 / _math.pi), (float(x), float(y)))
+
+                name = f"{directory}/frame_{frame:05d}.png"
+
+                if self.archive is None:
+                    _os.makedirs(_os.path.join(self.directory, directory), exist_ok=True)
+                    _pygame.image.save(surface, _os.path.join(self.directory, name))
+
+                else:
+                    buffer = _io.BytesIO()
+                    _pygame.image.save(surface, buffer, name)
+                    self.archive.writestr(name, buffer.getvalue())
+
+                self.written += 1
+
+    def close(self) -> None:
+        """Waits for the queued frames to be written and closes the archive."""
+
+        self.queue.put(None)
+        self.thread.join()
+
+        if self.archive is not None:
+            self.archive.close()
+
+
+def serve(population, track, fps: int = 60, frames: FrameWriter = None) -> None:
+    """
+    Trains the population at full speed while a separate renderer process draws the latest snapshots.
+
+    Returns when the renderer window is closed.
+
+    Args:
+        population (Population): The population to train.
+        track (Track): The track the population drives on.
+        fps (int, optional): The renderer's frame rate. Defaults to 60.
+        frames (FrameWriter, optional): Writes sampled generations to disk as they are trained. Defaults to None.
+    """
+
+    state = SharedState(population.population_size)
+
+    # the road is transparent in the track image, so it is flattened onto white before it is handed over
+    track_image = _pygame.Surface(track.image.get_size())
+    track_image.fill((255, 255, 255))
+    track_image.blit(track.image, (0, 0))
+
+    with _tempfile.NamedTemporaryFile(suffix=".png", delete=False) as file:
+        track_path = file.name
+    _pygame.image.save(track_image, track_path)
+
+    renderer = _subprocess.Popen([
+        _sys.executable, __file__, state.name, track_path,
+        "--capacity", str(state.capacity), "--history", str(state.history_capacity), "--fps", str(fps)
+    ])
+
+    steps, last_time, steps_per_second = 0, _time.perf_counter(), 0
+
+    try:
+        while not state.stopped and renderer.poll() is None:
+            population.train(None, 1)
+            steps += 1
+
+            current_time = _time.perf_counter()
+            if current_time - last_time >= 1:
+                steps_per_second = steps / (current_time - last_time)
+                steps, last_time = 0, current_time
+
+            state.publish(population, steps_per_second)
+
+            if frames is not None:
+                frames.capture(population)
+
+    finally:
+        state.stop()
+        renderer.wait()
+        state.close(unlink=True)
+        _os.remove(track_path)
+
+
+def render(name, track_path, capacity, history_capacity, fps) -> None:
+    _pygame.init()
+    win = _pygame.display.set_mode((1400, 900))
+    _pygame.display.set_caption("NeuroEvolution")
+
+    track = Track.from_path(track_path)
+    car_image = load_image("assets/car.png").copy()
+    font = _pygame.font.Font("assets/pixel_font.ttf", 45)
+    clock = _pygame.time.Clock()
+    state = SharedState(capacity, history_capacity, name=name)
+    snapshot = None
+
+    while not state.stopped:
+        for event in _pygame.event.get():
+            if event.type == _pygame.QUIT:
+                state.stop()
+
+        snapshot = state.read() or snapshot
+
+        if snapshot:
+            stats, cars, history = snapshot
+            win.fill((255, 255, 255))
+            track.draw(win, 0, 0)
+
+            for x, y, angle, highlight in cars:
+                car_image.set_alpha(255 if highlight else 50)
+                win.blit(_pygame.transform.rotate(car_image, angle * 180 / _math.pi), (float(x), float(y)))
+
+            draw_stats(win, font, stats, history)
+            font_surface = font.render(f"steps/s: {round(stats['steps_per_second'])}", True, (255, 255, 255))
+            win.blit(font_surface, (10, 4 * 35))
+
+        _pygame.display.flip()
+        clock.tick(fps)
+
+    state.close()
+    _pygame.quit()
+
+
+if __name__ == "__main__":
+    parser = _argparse.ArgumentParser(description="Draws the snapshots a headless trainer publishes.")
+    parser.add_argument("name")
+    parser.add_argument("track")
+    parser.add_argument("--capacity", type=int, required=True)
+    parser.add_argument("--history", type=int, default=1024)
+    parser.add_argument("--fps", type=int, default=60)
+    args = parser.parse_args()
+
+    render(args.name, args.track, args.capacity, args.history, args.fps)
\ No newline at end of file
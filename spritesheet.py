@@ -1,14 +1,40 @@
+import functools as _functools
+import json as _json
+
 import pygame as _pygame
 
-import json as _json
+
+@_functools.lru_cache(maxsize=None)
+def load_image(path) -> _pygame.Surface:
+    """Loads an image once per process, later calls share the surface. It is only converted when a display exists."""
+    image = _pygame.image.load(path)
+    return image.convert_alpha() if _pygame.display.get_surface() else image
+
 
 class Spritesheet:
+    _atlases = {}
+
     def __init__(self, filename) -> None:
         self.filename = filename
-        self.sprite_sheet = _pygame.image.load(filename).convert()
         self.meta_data = self.filename.replace("png", "json")
+
+        if filename not in Spritesheet._atlases:
+            Spritesheet._atlases[filename] = self._slice()
+
+        self.sprite_sheet, self.image_data, self.sprites = Spritesheet._atlases[filename]
+
+    def _slice(self):
+        sprite_sheet = _pygame.image.load(self.filename).convert()
         with open(self.meta_data) as file:
-            self.image_data = _json.load(file)
+            image_data = _json.load(file)
+
+        sprites = {}
+        for name, data in image_data["frames"].items():
+            sprite = data["frame"]
+            sprites[name] = sprite_sheet.subsurface((sprite["x"], sprite["y"], sprite["w"], sprite["h"]))
+            sprites[name].set_colorkey((0, 0, 0))
+
+        return sprite_sheet, image_data, sprites
 
     def _get_sprite(self, x, y, width, height, colourkey) -> _pygame.Surface:
         sprite = _pygame.Surface((width, height))
@@ -17,6 +43,10 @@ class Spritesheet:
         return sprite
 
     def load_sprite(self, name, colourkey=(0, 0, 0)) -> _pygame.Surface:
+        # the sliced sprites are shared by every Spritesheet of the same file, callers get their own copy to draw on
+        if colourkey == (0, 0, 0):
+            return self.sprites[name].copy()
+
         sprite = self.image_data["frames"][name]["frame"]
 
         return self._get_sprite(sprite["x"], sprite["y"], sprite["w"], sprite["h"], colourkey)
\ No newline at end of file
@@ -0,0 +1,182 @@
+import argparse as _argparse
+import csv as _csv
+import itertools as _itertools
+import json as _json
+import math as _math
+import multiprocessing as _multiprocessing
+import os as _os
+import random as _random
+import time as _time
+
+from population import MUTATION_RATE, PROGRESS_WINDOW, STATIONARY_FRAMES
+
+# settings a sweep can vary and their defaults, the values main.py trains with
+DEFAULTS = {
+    "population_size": 350,
+    "mutation_rate": MUTATION_RATE,
+    "stationary_frames": STATIONARY_FRAMES,
+    "progress_window": PROGRESS_WINDOW,
+    "directions": 32,
+    "hidden_layers": [24, 16, 12, 8],
+    "evolve_topology": False,
+    "decision_interval": 1,
+    "stagger_decisions": False,
+}
+
+RESULTS = ["final_fitness", "best_fitness", "generations_to_target", "evaluations_per_second"]
+
+
+def configurations(spec):
+    """
+    Expands a sweep spec into the list of runs it describes.
+
+    A spec holds either a "grid" mapping each setting to the values to try, or a "random" mapping each
+    setting to a list of choices or a {"low": ..., "high": ...} range along with "samples", the number of draws. Every
+    configuration is run once per seed in "seeds". Random draws come from "search_seed", so expanding a
+    spec again gives the same runs, which is what lets an interrupted sweep resume.
+
+    Args:
+        spec (dict): The sweep spec.
+
+    Returns:
+        list: A dict of settings, including its seed, for each run.
+    """
+
+    if "grid" in spec:
+        names = list(spec["grid"])
+        settings = [dict(zip(names, values)) for values in _itertools.product(*spec["grid"].values())]
+
+    else:
+        random = _random.Random(spec.get("search_seed", 0))
+        settings = []
+
+        for _ in range(spec["samples"]):
+            sample = {}
+
+            for name, space in spec["random"].items():
+                if isinstance(space, dict):
+                    low, high = space["low"], space["high"]
+                    sample[name] = random.randint(low, high) if isinstance(low, int) else random.uniform(low, high)
+
+                else:
+                    sample[name] = random.choice(space)
+
+            settings.append(sample)
+
+    return [{**DEFAULTS, **setting, "seed": seed} for setting in settings for seed in spec.get("seeds", [0])]
+
+
+def run_key(configuration):
+    return _json.dumps(configuration, sort_keys=True)
+
+
+def run(task):
+    """
+    Trains one configuration headless and measures it.
+
+    Args:
+        task (tuple): The configuration, the track path, the start pose, the generation count and the target fitness.
+
+    Returns:
+        dict: The configuration's settings and results.
+    """
+
+    configuration, track_path, start_position, start_angle, generations, target_fitness = task
+
+    import numpy
+
+    from enviroment import Track
+    from population import Population
+
+    # pygame is left uninitialised, SDL would otherwise catch the SIGTERM the pool stops its workers with
+    numpy.random.seed(configuration["seed"])
+
+    car_options = {
+        "directions": configuration["directions"],
+        "hidden_layers": configuration["hidden_layers"],
+        "stationary_frames": configuration["stationary_frames"],
+        "progress_window": configuration["progress_window"],
+        "evolve_topology": configuration["evolve_topology"],
+        "decision_interval": configuration["decision_interval"],
+    }
+    population = Population(
+        configuration["population_size"], Track.from_path(track_path), start_position, start_angle,
+        mutation_rate=configuration["mutation_rate"], model_path=None, car_options=car_options,
+        stagger_decisions=configuration["stagger_decisions"]
+    )
+
+    generations_to_target = None
+    start = _time.perf_counter()
+
+    while population.generation <= generations:
+        population.train(None, 1)
+
+        if generations_to_target is None and target_fitness is not None and population.best_fitness >= target_fitness:
+            generations_to_target = population.generation
+
+    elapsed = _time.perf_counter() - start
+
+    return {
+        "key": run_key(configuration),
+        **configuration,
+        "final_fitness": population.history[-1],
+        "best_fitness": population.best_fitness,
+        "generations_to_target": generations_to_target,
+        "evaluations_per_second": generations * population.population_size / elapsed,
+    }
+
+
+def sweep(spec, output, processes=None):
+    """
+    Runs every configuration of a spec that output does not already hold, appending a row as each finishes.
+
+    Args:
+        spec (dict): The sweep spec, see configurations, with "track", "start" as [x, y, angle in degrees],
+            "generations" and an optional "target_fitness".
+        output (str): The CSV results table.
+        processes (int, optional): The number of worker processes, all cores when None. Defaults to None.
+    """
+
+    runs = configurations(spec)
+    columns = ["key", *DEFAULTS, "seed", *RESULTS]
+    header = None
+    done = set()
+
+    if _os.path.exists(output) and _os.path.getsize(output):
+        with open(output, newline="") as file:
+            reader = _csv.DictReader(file)
+            header = reader.fieldnames
+            done = {row["key"] for row in reader}
+
+        # rows are appended by position, so a table from a version with other settings would be misaligned
+        if header != columns:
+            raise ValueError(f"{output} has the columns {header} but this sweep writes {columns}, use a new file")
+
+    start_position, start_angle = tuple(spec["start"][:2]), spec["start"][2] * _math.pi / 180
+    tasks = [
+        (configuration, spec["track"], start_position, start_angle, spec["generations"], spec.get("target_fitness"))
+        for configuration in runs if run_key(configuration) not in done
+    ]
+    print(f"{len(runs) - len(tasks)} of {len(runs)} runs already done")
+
+    with open(output, "a", newline="") as file, _multiprocessing.Pool(processes) as pool:
+        writer = _csv.DictWriter(file, columns)
+
+        if header is None:
+            writer.writeheader()
+
+        for result in pool.imap_unordered(run, tasks):
+            writer.writerow(result)
+            file.flush()
+            print(", ".join(f"{name} {result[name]}" for name in [*DEFAULTS, "seed", *RESULTS]))
+
+
+if __name__ == "__main__":
+    parser = _argparse.ArgumentParser(description="Trains headless over a grid or random search of settings.")
+    parser.add_argument("spec", help="JSON sweep spec")
+    parser.add_argument("output", help="CSV results table, runs already in it are skipped")
+    parser.add_argument("--processes", type=int, default=None)
+    args = parser.parse_args()
+
+    with open(args.spec) as file:
+        sweep(_json.load(file), args.output, args.processes)
\ No newline at end of file
@@ -0,0 +1,176 @@
+import argparse as _argparse
+import collections as _collections
+import hashlib as _hashlib
+import json as _json
+
+import numpy as _numpy
+import pygame as _pygame
+
+
+def save_tiles(path: str, occupancy, tile_size: int = 256, top: int = 0) -> None:
+    """
+    Writes a collision grid as a memory-mappable file of bit packed square tiles.
+
+    The tiles go to path.npy and the size and tile size to path.json. The grid is read one tile at a time,
+    so it can itself be a memory map bigger than RAM.
+
+    Args:
+        path (str): The file path without an extension.
+        occupancy: A (width, height) boolean array, True where the car collides.
+        tile_size (int, optional): The side of a tile in pixels, a multiple of 8. Defaults to 256.
+        top (int, optional): The height of the band at the top that cars may not enter. Defaults to 0.
+    """
+
+    width, height = occupancy.shape
+    tiles_x, tiles_y = -(-width // tile_size), -(-height // tile_size)
+
+    bits = _numpy.lib.format.open_memmap(
+        path + ".npy", mode="w+", dtype=_numpy.uint8, shape=(tiles_x, tiles_y, tile_size, tile_size // 8)
+    )
+    digest = _hashlib.blake2b(digest_size=16)
+    tile = _numpy.zeros((tile_size, tile_size), dtype=bool)
+
+    for tile_x in range(tiles_x):
+        for tile_y in range(tiles_y):
+            block = occupancy[tile_x * tile_size:(tile_x + 1) * tile_size, tile_y * tile_size:(tile_y + 1) * tile_size]
+            tile[:] = False
+            tile[:block.shape[0], :block.shape[1]] = block
+
+            bits[tile_x, tile_y] = _numpy.packbits(tile, axis=1)
+            digest.update(bits[tile_x, tile_y].tobytes())
+
+    bits.flush()
+
+    with open(path + ".json", "w") as file:
+        _json.dump({"width": width, "height": height, "top": top, "tile_size": tile_size, "digest": digest.hexdigest()}, file)
+
+
+class TiledTrack:
+    """A track whose collision grid is a memory-mapped file of tiles, loaded on demand.
+
+    Opening one only reads its metadata, tiles are turned into masks the first time a car's sensors or
+    collision checks touch them and a bounded number are kept, so memory follows the area cars actually
+    visit. Every process can map the same file read only. It has no image, so it is for headless training.
+    """
+
+    def __init__(self, path: str, max_tiles: int = 64) -> None:
+        """
+        Opens a track written by save_tiles.
+
+        Args:
+            path (str): The file path without an extension.
+            max_tiles (int, optional): The number of tile masks cached before the oldest is dropped. Defaults to 64.
+        """
+
+        with open(path + ".json") as file:
+            meta_data = _json.load(file)
+
+        self.WIDTH, self.HEIGHT = meta_data["width"], meta_data["height"]
+        self.TOP = meta_data["top"]
+        self.tile_size = meta_data["tile_size"]
+        self.digest = meta_data["digest"]
+
+        self.bits = _numpy.load(path + ".npy", mmap_mode="r")
+        self.tiles = _collections.OrderedDict()
+        self.max_tiles = max_tiles
+        self.loads = 0
+
+        self.progress = None
+
+    def tile(self, tile_x: int, tile_y: int) -> _pygame.Mask:
+        """
+        Gets the mask of a tile, loading it from the file if it is not cached.
+
+        Hits are not reordered, so the oldest loaded tile is the one dropped. That is close enough to LRU for
+        cars sweeping across a map and keeps the hit path, which every sensor ray takes, cheap.
+
+        Args:
+            tile_x (int): The tile's column.
+            tile_y (int): The tile's row.
+
+        Returns:
+            pygame.Mask: The tile's collision mask.
+        """
+
+        mask = self.tiles.get((tile_x, tile_y))
+
+        if mask is None:
+            occupied = _numpy.unpackbits(self.bits[tile_x, tile_y], axis=1)
+            surface = _pygame.surfarray.make_surface(occupied)
+            surface.set_colorkey(0)
+            mask = _pygame.mask.from_surface(surface)
+
+            self.tiles[tile_x, tile_y] = mask
+            self.loads += 1
+
+            if len(self.tiles) > self.max_tiles:
+                self.tiles.popitem(last=False)
+
+        return mask
+
+    def get_at(self, position) -> int:
+        x, y = int(position[0]), int(position[1])
+
+        if not (0 <= x < self.WIDTH and 0 <= y < self.HEIGHT):
+            raise IndexError("position out of bounds")
+
+        size = self.tile_size
+        mask = self.tiles.get((x // size, y // size))
+
+        if mask is None:
+            mask = self.tile(x // size, y // size)
+
+        return mask.get_at((x % size, y % size))
+
+    def collides(self, mask: _pygame.Mask, x: float, y: float) -> bool:
+        """
+        Checks whether a mask placed at a position overlaps the track.
+
+        Args:
+            mask (pygame.Mask): The mask to check, such as a car's.
+            x (float): The mask's x position on the track.
+            y (float): The mask's y position on the track.
+
+        Returns:
+            bool: Whether any set bit of the mask lies on a set bit of the track.
+        """
+
+        x, y = int(x), int(y)
+        width, height = mask.get_size()
+        tiles_x, tiles_y = self.bits.shape[:2]
+
+        for tile_x in range(max(x // self.tile_size, 0), min((x + width - 1) // self.tile_size, tiles_x - 1) + 1):
+            for tile_y in range(max(y // self.tile_size, 0), min((y + height - 1) // self.tile_size, tiles_y - 1) + 1):
+                if mask.overlap(self.tile(tile_x, tile_y), (tile_x * self.tile_size - x, tile_y * self.tile_size - y)):
+                    return True
+
+        return False
+
+    def occupancy(self) -> _numpy.ndarray:
+        """Reads the whole collision grid into memory, only sensible for tracks that fit in it."""
+
+        tiles_x, tiles_y, tile_size, _ = self.bits.shape
+        occupied = _numpy.unpackbits(self.bits, axis=3).transpose(0, 2, 1, 3).reshape(tiles_x * tile_size, tiles_y * tile_size)
+
+        return occupied[:self.WIDTH, :self.HEIGHT].astype(bool)
+
+    def fingerprint(self) -> bytes:
+        return bytes.fromhex(self.digest)
+
+    def measure_progress(self, start, angle) -> None:
+        """A progress field would span the whole map, so cars on tiled tracks keep the distance fitness."""
+
+        return None
+
+
+if __name__ == "__main__":
+    parser = _argparse.ArgumentParser(description="Converts a track image into a tiled, memory-mappable track.")
+    parser.add_argument("image")
+    parser.add_argument("output", help="output path without an extension")
+    parser.add_argument("--tile-size", type=int, default=256)
+    args = parser.parse_args()
+
+    from enviroment import Track
+
+    track = Track.from_path(args.image)
+    save_tiles(args.output, track.occupancy(), args.tile_size, track.TOP)
\ No newline at end of file
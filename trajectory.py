@@ -0,0 +1,98 @@
+import math as _math
+
+import numpy as _numpy
+import pygame as _pygame
+
+
+class TrajectoryBuffer:
+    """A growable array of per-frame poses, one (x, y, angle, velocity, action) row per frame."""
+
+    FIELDS = 5
+
+    def __init__(self, capacity: int = 1024) -> None:
+        """
+        Initializes an empty buffer.
+
+        Args:
+            capacity (int, optional): The number of frames to allocate up front. Defaults to 1024.
+        """
+
+        self.data = _numpy.empty((capacity, self.FIELDS), dtype=_numpy.float32)
+        self.length = 0
+
+    def append(self, x: float, y: float, angle: float, velocity: float, action: int) -> None:
+        """
+        Records one frame, doubling the allocation when it is full.
+
+        Args:
+            x (float): The car's x position.
+            y (float): The car's y position.
+            angle (float): The car's heading in radians.
+            velocity (float): The car's velocity.
+            action (int): The encoded action taken this frame.
+        """
+
+        if self.length == len(self.data):
+            self.data = _numpy.resize(self.data, (len(self.data) * 2, self.FIELDS))
+
+        self.data[self.length] = x, y, angle, velocity, action
+        self.length += 1
+
+    def clear(self) -> None:
+        """Forgets the recorded frames but keeps the allocation for reuse."""
+
+        self.length = 0
+
+    @property
+    def poses(self) -> _numpy.ndarray:
+        return self.data[:self.length]
+
+    def save(self, path: str) -> None:
+        """
+        Saves the recorded frames as a .npy file.
+
+        Args:
+            path (str): The file path to save the trajectory to.
+        """
+
+        _numpy.save(path, self.poses)
+
+
+class Replay:
+    """Plays back a saved trajectory without a network or physics."""
+
+    def __init__(self, path: str, image: _pygame.Surface) -> None:
+        """
+        Loads a trajectory to replay.
+
+        Args:
+            path (str): The .npy file saved by TrajectoryBuffer.save.
+            image (pygame.Surface): The car image to draw.
+        """
+
+        self.poses = _numpy.load(path)
+        self.image = image
+        self.frame = 0.0
+
+    @property
+    def finished(self) -> bool:
+        return self.frame >= len(self.poses)
+
+    def update(self, surface: _pygame.Surface, speed: float, dt: float) -> None:
+        """
+        Draws the current frame and advances the playback, looping at the end.
+
+        Args:
+            surface (pygame.Surface): The surface to draw on.
+            speed (float): Frames of the recording played per simulation frame.
+            dt (float): The time passed since the last frame, in simulation frames.
+        """
+
+        if self.finished:
+            self.frame = 0.0
+
+        x, y, angle, _, _ = self.poses[int(self.frame)]
+        rotated_image = _pygame.transform.rotate(self.image, angle * 180 / _math.pi)
+        surface.blit(rotated_image, (float(x), float(y)))
+
+        self.frame += speed * dt
\ No newline at end of file